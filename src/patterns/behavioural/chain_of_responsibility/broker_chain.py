@@ -2,13 +2,8 @@
 # command-query separation
 from abc import ABC, abstractmethod
 from enum import Enum
-from unittest.case import DIFF_OMITTED
 
-
-class Event(list):
-    def __call__(self, *args, **kwargs):
-        for item in self:
-            item(*args, **kwargs)
+from events import *
 
 
 class WhatToQuery(Enum):
@@ -27,18 +22,83 @@ class Query:
 # this class will handle the queries by the user
 class Game:
     def __init__(self):
-        # this is the chain of responsibilities (it's a list with callable items)
-        self.queries = Event()
+        # these are the chains of responsibilities, one for each (creature name, what to query) key, so that a query
+        # only visits the modifiers that can actually affect it instead of every modifier in the game
+        self.queries = {}
+
+        # every time the modifiers of a creature change, its epoch is bumped so that the stats cached by the creature
+        # are known to be stale
+        self.epochs = {}
+
+        # the chains folded by compile_chain, dropped whenever the chain of their key changes
+        self.compiled = {}
+
+    def add_modifier(self, modifier):
+        for what_to_query in modifier.targets:
+            key = (modifier.creature.name, what_to_query)
+            if key not in self.queries:
+                self.queries[key] = Event()
+            modifier.subscriptions.append(self.queries[key].subscribe(modifier))
+            self.compiled.pop(key, None)
+        self.invalidate(modifier.creature.name)
+
+    def remove_modifier(self, modifier):
+        # the handles were taken in the same order as the targets
+        for what_to_query, subscription in zip(modifier.targets, modifier.subscriptions):
+            key = (modifier.creature.name, what_to_query)
+            subscription.unsubscribe()
+            if not subscription.event:
+                del self.queries[key]
+            self.compiled.pop(key, None)
+        modifier.subscriptions.clear()
+        self.invalidate(modifier.creature.name)
+
+    def invalidate(self, creature_name):
+        self.epochs[creature_name] = self.epochs.get(creature_name, 0) + 1
+
+    # folds the chain of a key into stages: runs of algebraic modifiers become a single (scale, offset) pair, since
+    # applying x -> a1 * x + b1 and then x -> a2 * x + b2 is the same as x -> (a2 * a1) * x + (a2 * b1 + b2), while any
+    # other modifier is kept as it is and called in its place in the chain
+    def compile_chain(self, key):
+        stages = []
+        for modifier in self.queries.get(key, ()):
+            if not isinstance(modifier, AlgebraicModifier):
+                stages.append(modifier)
+            elif stages and isinstance(stages[-1], tuple):
+                scale, offset = stages[-1]
+                stages[-1] = (modifier.scale * scale, modifier.scale * offset + modifier.offset)
+            else:
+                stages.append((modifier.scale, modifier.offset))
+        return stages
+
+    def stages(self, key):
+        stages = self.compiled.get(key)
+        if stages is None:
+            stages = self.compiled[key] = self.compile_chain(key)
+        return stages
 
     def perform_query(self, sender, query):
-        self.queries(sender, query)
+        for stage in self.stages((sender.name, query.what_to_query)):
+            if isinstance(stage, tuple):
+                query.value = stage[0] * query.value + stage[1]
+            else:
+                stage(sender, query)
 
 
 class CreatureModifier(ABC):
+    # the stats this modifier can change; the game registers the modifier only under these keys
+    targets = tuple(WhatToQuery)
+
     def __init__(self, game, creature):
         self.game = game
         self.creature = creature
-        self.game.queries.append(self.handle)
+        # the handles of the chains this modifier is subscribed to, used to leave them in constant time
+        self.subscriptions = []
+        self.game.add_modifier(self)
+
+    # the modifier itself is the callable stored in the chain
+    def __call__(self, sender, query):
+        self.handle(sender, query)
 
     @abstractmethod
     def handle(self, sender, query):
@@ -48,39 +108,77 @@ class CreatureModifier(ABC):
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.game.queries.remove(self.handle)
+        self.game.remove_modifier(self)
 
 
-class DoubleAttackModifier(CreatureModifier):
+# an algebraic modifier turns the value x into scale * x + offset, which lets the game fold a whole run of them into
+# a single operation; scale and offset must not change while the modifier is attached
+class AlgebraicModifier(CreatureModifier):
+    scale = 1
+    offset = 0
+
     def handle(self, sender, query):
-        if sender.name == self.creature.name and query.what_to_query == WhatToQuery.ATTACK:
-            query.value *= 2
+        query.value = self.scale * query.value + self.offset
 
 
-class IncreaseDefenseModifier(CreatureModifier):
-    def handle(self, sender, query):
-        if sender.name == self.creature.name and query.what_to_query == WhatToQuery.DEFENSE:
-            query.value += 1
+# since the game routes queries by creature and stat, the modifiers no longer need to filter them
+class DoubleAttackModifier(AlgebraicModifier):
+    targets = (WhatToQuery.ATTACK,)
+    scale = 2
+
+
+class IncreaseDefenseModifier(AlgebraicModifier):
+    targets = (WhatToQuery.DEFENSE,)
+    offset = 1
 
 
 class Creature:
     def __init__(self, game, name, attack, defense):
-        self.initial_attack = attack
-        self.initial_defense = defense
         self.game = game
         self.name = name
+        # the stats computed by the chain are memoized together with the epoch of the creature they were computed in,
+        # so reading a stat only runs the chain again after a modifier has been attached or detached
+        self.cache = {}
+        self.initial_attack = attack
+        self.initial_defense = defense
+
+    # changing a base stat drops the memoized stats as well
+    @property
+    def initial_attack(self):
+        return self._initial_attack
+
+    @initial_attack.setter
+    def initial_attack(self, value):
+        self._initial_attack = value
+        self.cache.clear()
+
+    @property
+    def initial_defense(self):
+        return self._initial_defense
+
+    @initial_defense.setter
+    def initial_defense(self, value):
+        self._initial_defense = value
+        self.cache.clear()
 
     # implement query to get attack value
     @property
     def attack(self):
-        q = Query(self.name, WhatToQuery.ATTACK, self.initial_attack)
-        self.game.perform_query(self, q)
-        return q.value
+        return self.query(WhatToQuery.ATTACK, self._initial_attack)
 
     @property
     def defense(self):
-        q = Query(self.name, WhatToQuery.DEFENSE, self.initial_defense)
+        return self.query(WhatToQuery.DEFENSE, self._initial_defense)
+
+    def query(self, what_to_query, default_value):
+        epoch = self.game.epochs.get(self.name, 0)
+        cached = self.cache.get(what_to_query)
+        if cached is not None and cached[0] == epoch:
+            return cached[1]
+
+        q = Query(self.name, what_to_query, default_value)
         self.game.perform_query(self, q)
+        self.cache[what_to_query] = (epoch, q.value)
         return q.value
 
     def __str__(self):
@@ -92,15 +190,15 @@ if __name__ == "__main__":
     goblin = Creature(game, "Strong Goblin", 2, 2)
     print(goblin)
 
-    # this will add to the game's event the double attack modifier, so game.queries member which is of class Event
-    # will have an item of DoubleAttackModifier (the object dam) in it
+    # this subscribes the double attack modifier to the chain of the goblin's attack: game.queries maps each
+    # (creature name, stat) pair to its own Event, so the entry for ("Strong Goblin", ATTACK) now holds the object dam
     dam = DoubleAttackModifier(game, goblin)
 
-    # this means that when we call the method print, the __str__ method of the creature class will call the queries
-    # to get the attack and defense values, which in turn will call the game.perform_query method which in turn will
-    # call (by means of self.queries object, the DoubleAttackModifier.handle event, with the sender being the goblin
-    # and the query having the creature initial_attack as value
-    # the self.handle will then modify the query.value by doubling it and the property will finish the return
+    # this means that when we call the method print, the __str__ method of the creature class will query the attack
+    # and defense values, which in turn will call the game.perform_query method; the game only goes through the chain
+    # of the goblin's attack, where the DoubleAttackModifier has been folded into a (scale, offset) stage of (2, 0),
+    # and applies it to the query, which has the creature initial_attack as value. The defense has no chain, so the
+    # query keeps the initial defense
     print(goblin)
 
     dam2 = DoubleAttackModifier(game, goblin)
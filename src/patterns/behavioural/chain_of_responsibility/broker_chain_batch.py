@@ -0,0 +1,114 @@
+# Batch queries for the broker chain
+# Instead of asking the game for one stat of one creature at a time, a whole population is queried at once: the base
+# values of N creatures are given as a NumPy array and the chain of every creature is applied to its rows as array
+# operations.
+from types import SimpleNamespace
+
+import numpy as np
+
+from broker_chain import *
+
+
+INT64 = np.iinfo(np.int64)
+
+
+# the type of a column holding numbers of type dtype along with more numbers, such that it keeps them all exactly as
+# Python computes them: int64 as long as every integer fits in it, float64 as soon as there is a float, object otherwise
+def exact_dtype(dtype, numbers=()):
+    if dtype.kind not in "biuf" or not all(isinstance(x, (int, float, np.integer, np.floating)) for x in numbers):
+        return np.dtype(object)
+    if dtype.kind == "f" or any(isinstance(x, (float, np.floating)) for x in numbers):
+        return np.result_type(dtype, np.float64)
+    if dtype.kind == "u" and dtype.itemsize == 8 or any(not INT64.min <= x <= INT64.max for x in numbers):
+        return np.dtype(object)
+    return np.dtype(np.int64)
+
+
+def largest(numbers):
+    return max((abs(int(x)) for x in numbers), default=0)
+
+
+def perform_batch_query(game, names, what_to_query, values):
+    names = np.asarray(names)
+    values = np.asarray(values)
+
+    # creatures sharing a name share their chain, so rows are grouped by name and each chain is looked up only once
+    unique_names, rows = np.unique(names, return_inverse=True)
+
+    # the chain of a creature whose modifiers are all algebraic has been folded by the game into a single
+    # (scale, offset) stage; the other chains are applied stage by stage afterwards
+    index = {name: i for i, name in enumerate(unique_names.tolist())}
+    folded_rows, folded_scales, folded_offsets = [], [], []
+    fallbacks = []
+    for name, what in game.queries:
+        i = index.get(name)
+        if what != what_to_query or i is None:
+            continue
+
+        stages = game.stages((name, what))
+        if len(stages) == 1 and isinstance(stages[0], tuple):
+            folded_rows.append(i)
+            folded_scales.append(stages[0][0])
+            folded_offsets.append(stages[0][1])
+        else:
+            fallbacks.append((i, stages))
+
+    # the result must be what the scalar chain gives, so a modifier that is not an integer promotes the whole result
+    # to floats, and integers only stay in int64 as long as no row can overflow it; otherwise the rows hold Python
+    # integers, which is exact but slower
+    dtype = exact_dtype(values.dtype, folded_scales + folded_offsets)
+    if dtype == np.int64 and values.size:
+        row = max(abs(int(values.min())), abs(int(values.max()))) * largest(folded_scales) + largest(folded_offsets)
+        dtype = exact_dtype(values.dtype, [row])
+    scale = np.ones(len(unique_names), dtype=dtype)
+    offset = np.zeros(len(unique_names), dtype=dtype)
+    scale[folded_rows] = folded_scales
+    offset[folded_rows] = folded_offsets
+    result = scale[rows] * values.astype(dtype, copy=False) + offset[rows]
+
+    if fallbacks:
+        order = np.argsort(rows, kind="stable")
+        bounds = np.searchsorted(rows[order], np.arange(len(unique_names) + 1))
+        groups = []
+        for i, stages in fallbacks:
+            # these chains are applied to Python numbers, like the scalar chain
+            matching = order[bounds[i]:bounds[i + 1]]
+            group = values[matching].tolist()
+            for stage in stages:
+                if isinstance(stage, tuple):
+                    group = [stage[0] * value + stage[1] for value in group]
+                    continue
+
+                # arbitrary modifiers can only be called one query at a time; they only get to see the name of the
+                # sender, since the population is not made of Creature objects
+                sender = SimpleNamespace(name=unique_names[i].item())
+                queried = []
+                for value in group:
+                    query = Query(sender.name, what_to_query, value)
+                    stage(sender, query)
+                    queried.append(query.value)
+                group = queried
+            groups.append((matching, group))
+
+        # the values the arbitrary modifiers give are only known once they have run
+        dtype = exact_dtype(result.dtype, [value for _, group in groups for value in group])
+        result = result.astype(dtype, copy=False)
+        for matching, group in groups:
+            result[matching] = np.array(group, dtype=dtype)
+
+    return result
+
+
+if __name__ == "__main__":
+    game = Game()
+    goblin = Creature(game, "Goblin", 2, 2)
+    orc = Creature(game, "Orc", 3, 1)
+    DoubleAttackModifier(game, goblin)
+    DoubleAttackModifier(game, goblin)
+    IncreaseDefenseModifier(game, orc)
+
+    names = np.array(["Goblin", "Orc", "Troll", "Goblin"])
+    attack = np.array([2, 3, 5, 1])
+    defense = np.array([2, 1, 4, 1])
+    print(perform_batch_query(game, names, WhatToQuery.ATTACK, attack))
+    print(perform_batch_query(game, names, WhatToQuery.DEFENSE, defense))
@@ -0,0 +1,50 @@
+# Benchmark for the broker chain
+# Reading a creature's stat should only cost as much as the modifiers applied to that creature: adding modifiers to
+# other creatures must leave the read time flat.
+import timeit
+
+from broker_chain import *
+
+
+def time_reads(game, creature, reads=10_000):
+    return timeit.timeit(lambda: creature.attack, number=reads) / reads
+
+
+# dropping the memoized stats before every read forces the chain to run
+def time_uncached_reads(game, creature, reads=10_000):
+    def read():
+        creature.cache.clear()
+        return creature.attack
+
+    return timeit.timeit(read, number=reads) / reads
+
+
+if __name__ == "__main__":
+    game = Game()
+    goblin = Creature(game, "Goblin", 2, 2)
+    DoubleAttackModifier(game, goblin)
+    IncreaseDefenseModifier(game, goblin)
+
+    others = []
+    for total in (0, 1_000, 10_000, 100_000):
+        # each unrelated creature gets an attack and a defense modifier
+        while len(others) < total:
+            creature = Creature(game, f"Orc {len(others)}", 1, 1)
+            DoubleAttackModifier(game, creature)
+            IncreaseDefenseModifier(game, creature)
+            others.append(creature)
+
+        print(f"{2 * total:>7} unrelated modifiers: "
+              f"{time_reads(game, goblin) * 1e6:.3f} us per read, "
+              f"{time_uncached_reads(game, goblin) * 1e6:.3f} us per uncached read")
+
+    # stacked algebraic buffs are folded into a single operation, so an uncached read should not grow with them
+    for stacked in (1, 10, 50, 200):
+        game = Game()
+        hero = Creature(game, "Hero", 2, 2)
+        for i in range(stacked):
+            DoubleAttackModifier(game, hero)
+            IncreaseDefenseModifier(game, hero)
+
+        print(f"{stacked:>7} stacked buffs per stat: "
+              f"{time_uncached_reads(game, hero) * 1e6:.3f} us per uncached read")
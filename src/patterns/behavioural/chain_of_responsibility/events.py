@@ -0,0 +1,59 @@
+# Events
+# An event holds the subscribers to be called when it is fired, each of them strongly or weakly referenced.
+import weakref
+from itertools import count
+
+
+# the handle returned when subscribing to an event
+class Subscription:
+    def __init__(self, event, key):
+        self.event = event
+        self.key = key
+
+    def unsubscribe(self):
+        self.event.unsubscribe(self)
+
+
+class Event:  # class Observer
+    # it holds the callable functions that are called when the event is triggered
+    def __init__(self):
+        # a dict keeps the subscribers in the order they subscribed, and lets each of them be removed by its key in
+        # constant time
+        self.subscribers = {}
+        self.keys = count()
+
+    # subscribing returns a handle that is used to unsubscribe; a weak subscriber is not kept alive by the event, and
+    # it is dropped from the event as soon as it is garbage collected
+    def subscribe(self, handler, weak=False):
+        key = next(self.keys)
+        if weak:
+            # bound methods are created on the fly, so they have to be referenced through WeakMethod
+            ref_type = weakref.WeakMethod if hasattr(handler, "__func__") else weakref.ref
+            handler = ref_type(handler, lambda _: self.subscribers.pop(key, None))
+        self.subscribers[key] = handler
+        return Subscription(self, key)
+
+    def unsubscribe(self, subscription):
+        self.subscribers.pop(subscription.key, None)
+
+    def __iter__(self):
+        for handler in list(self.subscribers.values()):
+            if isinstance(handler, weakref.ref):
+                handler = handler()
+            if handler is not None:
+                yield handler
+
+    def __len__(self):
+        return len(self.subscribers)
+
+    def __call__(self, *args, **kwargs):
+        # a subscriber may unsubscribe itself or others while being notified, so the calls go through a copy and skip
+        # whoever has already left
+        for key, handler in list(self.subscribers.items()):
+            if key not in self.subscribers:
+                continue
+            if isinstance(handler, weakref.ref):
+                handler = handler()
+                if handler is None:
+                    continue
+            handler(*args, **kwargs)
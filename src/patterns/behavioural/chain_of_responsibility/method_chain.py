@@ -14,48 +14,66 @@ class Creature:
 class CreatureModifier:
     def __init__(self, creature):
         self.creature = creature
-        self.next_modifier = None
 
-    # this method chains methods call for the modifiers through next_modifier; if the latter is initialized, it calls
-    # the method on it and "cascades" the following within next_modifier's add_modifier method
-    def add_modifier(self, modifier):
-        if self.next_modifier:
-            self.next_modifier.add_modifier(modifier)
-        else:
-            self.next_modifier = modifier
+        # the modifiers are kept in one flat list shared by the whole chain, along with the position of this modifier
+        # in it, so that adding a modifier is a single append instead of a walk to the end of the chain
+        self.chain = [self]
+        self.position = 0
+
+    # this used to be the link to the following modifier, it is now just the next item of the chain
+    @property
+    def next_modifier(self):
+        if self.position + 1 < len(self.chain):
+            return self.chain[self.position + 1]
+        return None
 
-    # this methods chains methods call for the modifiers through next_modifier: if the latter is initialized, it calls
-    # the method on it and "cascades" the following within next_modifier's handle method
+    # the added modifier, along with any modifier that follows it, is moved to the end of the chain
+    def add_modifier(self, modifier):
+        for moved in modifier.chain[modifier.position:]:
+            moved.chain = self.chain
+            moved.position = len(self.chain)
+            self.chain.append(moved)
+
+    # this is what a single modifier does to the creature; returning False stops the chain, so that the modifiers
+    # following this one are not applied
+    def apply(self):
+        return True
+
+    # this drives the chain from this modifier on with a plain loop, rather than every modifier calling the next one,
+    # so that the length of the chain is not bound by the recursion limit
     def handle(self):
-        if self.next_modifier:
-            self.next_modifier.handle()
+        chain = self.chain
+        for i in range(self.position, len(chain)):
+            if not chain[i].apply():
+                break
 
 
 class DoubleAttackModifier(CreatureModifier):
-    def handle(self):
+    def apply(self):
         print(f"Doubling {self.creature.name}'s attack")
         self.creature.attack *= 2
 
-        # call the superclass method to continue the chain of modifiers, if any
-        super().handle()
+        # continue the chain of modifiers, if any
+        return True
 
 
 class IncreaseDefenseModifier(CreatureModifier):
-    def handle(self):
+    def apply(self):
         if self.creature.attack <= 2:
             print(f"Increasing {self.creature.name} defense")
             self.creature.defense += 1
 
-        # call the superclass method to continue the chain of modifiers, if any
-        super().handle()
+        # continue the chain of modifiers, if any
+        return True
 
 
 class NoBonusesModifier(CreatureModifier):
-    def handle(self):
+    def apply(self):
         print("No bonuses for you")
 
-        # by skipping the super().handle() call, the chain of responsibility is not applied and thus the applying of
-        # following modifiers, if any, is skipped
+        # by returning False the chain of responsibility is not applied and thus the applying of following modifiers,
+        # if any, is skipped
+        return False
 
 
 if __name__ == "__main__":
@@ -0,0 +1,28 @@
+# Benchmark for the method chain
+# Building a chain appends each modifier to its end and handling it walks the modifiers with a loop, so both should
+# take linear time, even for chains far longer than the recursion limit.
+import time
+
+from method_chain import *
+
+
+# a modifier that does not print, so that only the chain itself is measured
+class IncreaseAttackModifier(CreatureModifier):
+    def apply(self):
+        self.creature.attack += 1
+        return True
+
+
+if __name__ == "__main__":
+    for length in (1_000, 10_000, 100_000):
+        goblin = Creature("Goblin", 1, 1)
+
+        start = time.perf_counter()
+        root = CreatureModifier(goblin)
+        for _ in range(length):
+            root.add_modifier(IncreaseAttackModifier(goblin))
+        built = time.perf_counter()
+        root.handle()
+        handled = time.perf_counter()
+
+        print(f"{length:>7} modifiers: built in {built - start:.3f} s, handled in {handled - built:.3f} s, {goblin}")
@@ -0,0 +1,122 @@
+# Columnar ledger
+# Invoking millions of BankAccountCommand objects one at a time costs several Python calls (and a print) per operation.
+# The ledger keeps the balances of all the accounts in one NumPy array indexed by account id, and takes the commands as
+# parallel arrays of accounts, actions and amounts: they are applied in order, with the same overdraft rule as
+# BankAccount, and the success flag of every command is returned so that the whole batch can be undone.
+import numpy as np
+
+from command import *
+
+DEPOSIT = BankAccountCommand.Action.DEPOSIT.value
+WITHDRAW = BankAccountCommand.Action.WITHDRAW.value
+
+
+# balances and amounts are kept in whole units (e.g. cents): anything else raises a ValueError rather than being
+# truncated
+def whole_units(values):
+    values = np.asarray(values)
+    if values.dtype.kind == "f" and not np.all(np.isfinite(values) & (values == np.floor(values))):
+        raise ValueError("balances and amounts must be whole units")
+    if values.dtype.kind not in "biuf":
+        raise ValueError("balances and amounts must be whole units")
+    return values.astype(np.int64)
+
+
+# turns commands into the arrays taken by the ledger; accounts is the list of accounts the ledger was built from
+def commands_to_arrays(commands, accounts):
+    rows = {id(account): row for row, account in enumerate(accounts)}
+    return (np.array([rows[id(command.account)] for command in commands], dtype=np.intp),
+            np.array([command.action.value for command in commands], dtype=np.int8),
+            whole_units([command.amount for command in commands]))
+
+
+class ColumnarLedger:
+    def __init__(self, balances, overdraft_limit=BankAccount.OVERDRAFT_LIMIT):
+        self.balances = whole_units(balances)
+        self.overdraft_limit = overdraft_limit
+
+    @classmethod
+    def from_accounts(cls, accounts):
+        return cls([account.balance for account in accounts])
+
+    def write_back(self, accounts):
+        for account, balance in zip(accounts, self.balances.tolist()):
+            account.balance = balance
+
+    def apply(self, accounts, actions, amounts):
+        accounts = np.asarray(accounts, dtype=np.intp)
+        actions = np.asarray(actions)
+        amounts = whole_units(amounts)
+        success = np.ones(len(accounts), dtype=bool)
+        if not len(accounts):
+            return success
+
+        # the commands of an account only depend on each other, so they are grouped by account, keeping their order
+        order = np.argsort(accounts, kind="stable")
+        grouped = accounts[order]
+        deposits = actions[order] == DEPOSIT
+        deltas = np.where(deposits, amounts[order], -amounts[order])
+
+        starts = np.flatnonzero(np.r_[True, grouped[1:] != grouped[:-1]])
+        ends = np.r_[starts[1:], len(grouped)] - 1
+        group = np.cumsum(np.r_[True, grouped[1:] != grouped[:-1]]) - 1
+
+        # the balance after each command, assuming all the commands before it in its account succeeded
+        running = np.cumsum(deltas)
+        running += (self.balances[grouped[starts]] - (running[starts] - deltas[starts]))[group]
+
+        # that assumption holds up to the first withdrawal going below the overdraft limit; accounts without any such
+        # withdrawal are done, while the others are replayed one command at a time from their first rejection on
+        rejected = ~deposits & (running < self.overdraft_limit)
+        final = running[ends]
+        flags = np.ones(len(grouped), dtype=bool)
+        for g in np.unique(group[rejected]).tolist():
+            start, end = starts[g], ends[g] + 1
+            first = start + int(np.argmax(rejected[start:end]))
+            balance = int(running[first] - deltas[first])
+            for i, delta in enumerate(deltas[first:end].tolist(), first):
+                if delta >= 0 or balance + delta >= self.overdraft_limit:
+                    balance += delta
+                else:
+                    flags[i] = False
+            final[g] = balance
+
+        self.balances[grouped[starts]] = final
+        success[order] = flags
+        return success
+
+    # undoes the commands that succeeded, last one first: as in BankAccountCommand.undo, a withdrawal is undone by a
+    # deposit and a deposit by a withdrawal, which may be rejected in turn; returns the flags of the undoing commands
+    def undo(self, accounts, actions, amounts, success):
+        done = np.flatnonzero(success)[::-1]
+        actions = np.asarray(actions)[done]
+        return self.apply(np.asarray(accounts)[done],
+                          np.where(actions == DEPOSIT, WITHDRAW, DEPOSIT),
+                          np.asarray(amounts)[done])
+
+
+if __name__ == "__main__":
+    import time
+
+    accounts = [BankAccount(100), BankAccount()]
+    commands = [
+        BankAccountCommand(accounts[0], BankAccountCommand.Action.WITHDRAW, 70),
+        BankAccountCommand(accounts[1], BankAccountCommand.Action.DEPOSIT, 50),
+        BankAccountCommand(accounts[0], BankAccountCommand.Action.WITHDRAW, 70),
+        BankAccountCommand(accounts[1], BankAccountCommand.Action.WITHDRAW, 20),
+    ]
+    ledger = ColumnarLedger.from_accounts(accounts)
+    batch = commands_to_arrays(commands, accounts)
+    success = ledger.apply(*batch)
+    print(f"success = {success}, balances = {ledger.balances}")
+    ledger.undo(*batch, success)
+    print(f"after undo, balances = {ledger.balances}")
+
+    # a settlement batch over many accounts
+    n, operations = 100_000, 10_000_000
+    rng = np.random.default_rng(0)
+    ledger = ColumnarLedger(rng.integers(0, 1000, n))
+    batch = (rng.integers(0, n, operations), rng.integers(0, 2, operations), rng.integers(1, 100, operations))
+    start = time.perf_counter()
+    success = ledger.apply(*batch)
+    print(f"{operations} commands applied in {time.perf_counter() - start:.2f} s, {np.count_nonzero(~success)} rejected")
@@ -0,0 +1,99 @@
+# Command bus
+# Commands are objects, so they can be handed over from whoever creates them to whoever runs them. The bus takes
+# commands from any number of asyncio producers into a bounded queue: when the queue is full, submitting waits until
+# there is room again (backpressure), so producers can never run ahead of the workers. Each submission returns an
+# awaitable resolving to the success flag of the command once it has run.
+import asyncio
+import weakref
+from contextlib import AsyncExitStack
+from itertools import count
+
+from concurrent_command import accounts_of
+from composite_command import *
+
+
+class CommandBus:
+    # at most one command runs on an account at a time, since BankAccount checks and changes its balance without any
+    # lock; a worker taking a command on a busy account waits for it, so many commands on one account in a row can
+    # hold up several workers. Commands run on the executor (the default thread pool of the loop if None), so that
+    # they do not block the event loop
+    def __init__(self, maxsize=1024, workers=8, executor=None):
+        self.queue = asyncio.Queue(maxsize)
+        self.workers = workers
+        self.executor = executor
+        self.tasks = []
+
+        # as with the concurrent executor, the accounts of a command are acquired by increasing rank, so that commands
+        # sharing accounts cannot deadlock
+        self.locks = weakref.WeakKeyDictionary()
+        self.ranks = count()
+
+    async def start(self):
+        self.tasks = [asyncio.create_task(self.work()) for _ in range(self.workers)]
+
+    # waits for every submitted command to run, then stops the workers
+    async def close(self):
+        await self.queue.join()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def submit(self, command):
+        result = asyncio.get_running_loop().create_future()
+        await self.queue.put((command, result))
+        return result
+
+    async def execute(self, command):
+        return await (await self.submit(command))
+
+    def lock_for(self, account):
+        entry = self.locks.get(account)
+        if entry is None:
+            entry = self.locks[account] = (next(self.ranks), asyncio.Lock())
+        return entry
+
+    async def work(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            command, result = await self.queue.get()
+            try:
+                accounts = {id(account): account for account in accounts_of(command)}
+                locks = sorted((self.lock_for(account) for account in accounts.values()), key=lambda entry: entry[0])
+                async with AsyncExitStack() as stack:
+                    for _, lock in locks:
+                        await stack.enter_async_context(lock)
+                    await loop.run_in_executor(self.executor, command.invoke)
+                if not result.cancelled():
+                    result.set_result(command.success)
+            except Exception as e:
+                if not result.cancelled():
+                    result.set_exception(e)
+            finally:
+                self.queue.task_done()
+
+
+if __name__ == "__main__":
+    async def main():
+        ba1, ba2 = BankAccount(100), BankAccount()
+
+        async with CommandBus(maxsize=4) as bus:
+            async def producer(amount):
+                # submitting waits while the queue is full; the results are awaited afterwards
+                results = [await bus.submit(MoneyTransferCommand(ba1, ba2, amount)) for _ in range(3)]
+                return await asyncio.gather(*results)
+
+            print(await asyncio.gather(producer(10), producer(40)))
+
+            print(await bus.execute(BankAccountCommand(ba2, BankAccountCommand.Action.WITHDRAW, 1000)))
+
+        print(f"ba1: {ba1}, ba2: {ba2}")
+
+    asyncio.run(main())
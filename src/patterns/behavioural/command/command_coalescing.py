@@ -0,0 +1,103 @@
+# Command coalescing
+# A burst of deposits and withdrawals on the same account does not need to touch the account once per command: the
+# commands are merged into a single one, which works out the outcome of each of them on a local balance and then moves
+# only the net amount. Every withdrawal is checked against the overdraft limit exactly as it would have been on its
+# own, so the merged command always behaves like the sequence it replaces.
+from composite_command import *
+
+
+class CoalescedBankAccountCommand(Command):
+    def __init__(self, commands):
+        super().__init__()
+        self.commands = commands
+        self.account = commands[0].account
+
+    def invoke(self):
+        start = balance = self.account.balance
+        for command in self.commands:
+            if command.action == BankAccountCommand.Action.DEPOSIT:
+                balance += command.amount
+                command.success = True
+            elif balance - command.amount >= self.account.OVERDRAFT_LIMIT:
+                balance -= command.amount
+                command.success = True
+            else:
+                command.success = False
+        self.move(balance - start)
+
+        # the success of each merged command is recorded on the command itself
+        self.success = True
+
+    # same as undoing the merged commands one by one, last one first: a withdrawal is undone by a deposit and a deposit
+    # by a withdrawal, which may be rejected in turn
+    def undo(self):
+        if not self.success:
+            return
+
+        start = balance = self.account.balance
+        for command in reversed(self.commands):
+            if not command.success:
+                continue
+            if command.action == BankAccountCommand.Action.WITHDRAW:
+                balance += command.amount
+            elif balance - command.amount >= self.account.OVERDRAFT_LIMIT:
+                balance -= command.amount
+        self.move(balance - start)
+
+    # the net amount always goes through: a net withdrawal means that some withdrawal succeeded, and no command after
+    # it took the balance below the overdraft limit
+    def move(self, amount):
+        if amount > 0:
+            self.account.deposit(amount)
+        elif amount < 0:
+            self.account.withdraw(-amount)
+
+
+# merges every run of adjacent deposits and withdrawals on the same account; any other command is kept as it is
+def coalesce(commands):
+    result = CompositeBankAccountCommand()
+    run = []
+
+    def flush():
+        if len(run) > 1:
+            result.append(CoalescedBankAccountCommand(list(run)))
+        else:
+            result.extend(run)
+        run.clear()
+
+    for command in commands:
+        if type(command) is not BankAccountCommand:
+            flush()
+            result.append(command)
+            continue
+        if run and run[-1].account is not command.account:
+            flush()
+        run.append(command)
+    flush()
+    return result
+
+
+if __name__ == "__main__":
+    ba1, ba2 = BankAccount(), BankAccount()
+    commands = CompositeBankAccountCommand([
+        BankAccountCommand(ba1, BankAccountCommand.Action.DEPOSIT, 100),
+        BankAccountCommand(ba1, BankAccountCommand.Action.WITHDRAW, 30),
+        BankAccountCommand(ba1, BankAccountCommand.Action.WITHDRAW, 100),
+        BankAccountCommand(ba1, BankAccountCommand.Action.DEPOSIT, 5),
+        MoneyTransferCommand(ba1, ba2, 50),
+        BankAccountCommand(ba2, BankAccountCommand.Action.DEPOSIT, 10),
+        BankAccountCommand(ba2, BankAccountCommand.Action.DEPOSIT, 10),
+    ])
+
+    # seven commands become three, and each account is touched once per run
+    coalesced = coalesce(commands)
+    print(f"{len(commands)} commands coalesced into {len(coalesced)}")
+
+    # a coalesced command still tells the concurrent executors which accounts it has to lock
+    from concurrent_command import accounts_of
+    names = {id(ba1): "ba1", id(ba2): "ba2"}
+    print([sorted({names[id(account)] for account in accounts_of(command)}) for command in coalesced])
+    coalesced.invoke()
+    print(f"ba1: {ba1}, ba2: {ba2}, withdrawals succeeded: {[cmd.success for cmd in commands[1:3]]}")
+    coalesced.undo()
+    print(f"ba1: {ba1}, ba2: {ba2}")
@@ -0,0 +1,281 @@
+# Command journal
+# Since a command holds everything needed to perform its action, it can also be written down: a journal appends every
+# invoked and undone command to a binary log, and replaying that log on startup rebuilds the balances of the accounts.
+# Syncing the log to disk is the expensive part, so it is done once for a group of commands (group commit) instead of
+# once per command.
+# To keep the replay short, the journal also takes snapshots of all the balances: the log is split into segments, a
+# snapshot holds the balances as of the start of a segment, and the segments before the latest snapshot are dropped.
+import os
+import struct
+import threading
+import zlib
+
+from command import *
+
+
+# the log is a sequence of fixed-size records: what happened to the command, its action, the id of the account, the
+# amount (in whole units, e.g. cents) and a checksum of all of that, so that a record torn by a crash is detected
+RECORD = struct.Struct("<BBQq")
+CHECKSUM = struct.Struct("<I")
+RECORD_SIZE = RECORD.size + CHECKSUM.size
+
+INVOKED = 0
+UNDONE = 1
+
+
+# a snapshot is the number of accounts followed by their ids and balances, and a checksum of all of that
+SNAPSHOT_HEADER = struct.Struct("<Q")
+SNAPSHOT_ENTRY = struct.Struct("<Qq")
+
+
+def pack_record(kind, action, account_id, amount):
+    record = RECORD.pack(kind, action.value, account_id, amount)
+    return record + CHECKSUM.pack(zlib.crc32(record))
+
+
+# yields the records of a log up to the first one that is incomplete or corrupted, along with the offset it ends at
+def read_records(file):
+    offset = 0
+    while True:
+        data = file.read(RECORD_SIZE)
+        if len(data) < RECORD_SIZE:
+            return
+        record, (checksum,) = data[:RECORD.size], CHECKSUM.unpack(data[RECORD.size:])
+        if zlib.crc32(record) != checksum:
+            return
+        offset += RECORD_SIZE
+        kind, action, account_id, amount = RECORD.unpack(record)
+        yield kind, BankAccountCommand.Action(action), account_id, amount, offset
+
+
+# replaying applies the balance changes directly, without printing, but with the same overdraft rule as the account:
+# starting from the same balances, every command then succeeds or fails exactly as it originally did
+def apply_record(account, kind, action, amount):
+    deposit = (action == BankAccountCommand.Action.DEPOSIT) == (kind == INVOKED)
+    if deposit:
+        account.balance += amount
+    elif account.balance - amount >= account.OVERDRAFT_LIMIT:
+        account.balance -= amount
+
+
+def pack_snapshot(accounts):
+    data = bytearray(SNAPSHOT_HEADER.pack(len(accounts)))
+    for account_id, account in accounts.items():
+        data += SNAPSHOT_ENTRY.pack(account_id, account.balance)
+    return bytes(data + CHECKSUM.pack(zlib.crc32(data)))
+
+
+# returns the balances of a snapshot, or None if it was not completely written
+def unpack_snapshot(data):
+    if len(data) < SNAPSHOT_HEADER.size + CHECKSUM.size:
+        return None
+    (count,) = SNAPSHOT_HEADER.unpack_from(data)
+    end = SNAPSHOT_HEADER.size + count * SNAPSHOT_ENTRY.size
+    if len(data) != end + CHECKSUM.size or zlib.crc32(data[:end]) != CHECKSUM.unpack_from(data, end)[0]:
+        return None
+    return dict(SNAPSHOT_ENTRY.iter_unpack(data[SNAPSHOT_HEADER.size:end]))
+
+
+def segment_name(number):
+    return f"{number:08d}.log"
+
+
+def snapshot_name(number):
+    return f"{number:08d}.snapshot"
+
+
+class CommandJournal:
+    # accounts maps the ids written to the log to the accounts; opening the journal loads the latest snapshot in the
+    # directory and replays the segments that follow it into them, so without a snapshot the accounts must be in the
+    # state they were in when the log was started.
+    # The log is synced to disk after group_size commands, or group_interval seconds after the first unsynced one,
+    # whichever comes first: that is how many commands a crash can lose. sync() makes everything logged so far durable.
+    # A snapshot is taken every snapshot_interval commands, if given, or whenever snapshot() is called.
+    def __init__(self, directory, accounts, group_size=64, group_interval=0.01, snapshot_interval=None):
+        self.directory = directory
+        self.accounts = accounts
+        self.account_ids = {id(account): account_id for account_id, account in accounts.items()}
+        self.group_size = group_size
+        self.group_interval = group_interval
+        self.snapshot_interval = snapshot_interval
+        self.pending = 0
+        self.since_snapshot = 0
+        # the lock also covers running the command, so that the balances a snapshot sees match the log exactly
+        self.lock = threading.RLock()
+
+        os.makedirs(directory, exist_ok=True)
+        self.segment, self.replayed = self.recover()
+        self.file = open(self.path(segment_name(self.segment)), "ab")
+
+        self.closed = threading.Event()
+        self.flusher = threading.Thread(target=self.flush_periodically, daemon=True)
+        self.flusher.start()
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def numbers(self, suffix):
+        return sorted(int(name[:-len(suffix)]) for name in os.listdir(self.directory) if name.endswith(suffix))
+
+    # loads the newest complete snapshot and replays the segments from there on; returns the segment new records
+    # go to and how many records were replayed
+    def recover(self):
+        first = 0
+        for number in reversed(self.numbers(".snapshot")):
+            with open(self.path(snapshot_name(number)), "rb") as file:
+                balances = unpack_snapshot(file.read())
+            if balances is not None:
+                for account_id, balance in balances.items():
+                    self.accounts[account_id].balance = balance
+                first = number
+                break
+
+        segments = [number for number in self.numbers(".log") if number >= first] or [first]
+        count = 0
+        for number in segments:
+            count += self.replay(self.path(segment_name(number)))
+        return segments[-1], count
+
+    def replay(self, path):
+        if not os.path.exists(path):
+            return 0
+
+        count = end = 0
+        with open(path, "rb") as file:
+            for kind, action, account_id, amount, end in read_records(file):
+                apply_record(self.accounts[account_id], kind, action, amount)
+                count += 1
+
+        # whatever follows the last valid record was torn by a crash, and new records must not be appended after it
+        if os.path.getsize(path) != end:
+            with open(path, "r+b") as file:
+                file.truncate(end)
+        return count
+
+    # the journal is written ahead: the record of a command is built and written before the command changes its
+    # account, so a command that cannot be logged is never run. Every invoked command is logged, even one that fails,
+    # since replaying it fails the same way
+    def invoke(self, command):
+        with self.lock:
+            self.append(self.record(INVOKED, command))
+            command.invoke()
+            self.logged()
+
+    def undo(self, command):
+        # undoing a command that did not succeed does nothing, so there is nothing to log either
+        with self.lock:
+            if command.success:
+                self.append(self.record(UNDONE, command))
+                command.undo()
+                self.logged()
+
+    # raises a KeyError for an account the journal does not know, and a TypeError for an amount that is not in whole
+    # units, rather than let the command run without being logged
+    def record(self, kind, command):
+        account_id = self.account_ids.get(id(command.account))
+        if account_id is None:
+            raise KeyError("the account of the command is not in the journal")
+        if not isinstance(command.amount, int):
+            raise TypeError(f"amounts are logged in whole units, not {command.amount!r}")
+        return pack_record(kind, command.action, account_id, command.amount)
+
+    def append(self, record):
+        with self.lock:
+            self.file.write(record)
+            self.pending += 1
+            self.since_snapshot += 1
+
+    # called once the command of the last record has run, so that a snapshot includes it
+    def logged(self):
+        with self.lock:
+            if self.snapshot_interval and self.since_snapshot >= self.snapshot_interval:
+                self.snapshot()
+            elif self.pending >= self.group_size:
+                self._sync()
+
+    # starts a new segment, writes the balances as of its start and drops everything older
+    def snapshot(self):
+        with self.lock:
+            self._sync()
+            self.file.close()
+            self.segment += 1
+            self.file = open(self.path(segment_name(self.segment)), "ab")
+
+            # the snapshot only replaces the older files once it is completely on disk
+            temporary = self.path(snapshot_name(self.segment) + ".tmp")
+            with open(temporary, "wb") as file:
+                file.write(pack_snapshot(self.accounts))
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary, self.path(snapshot_name(self.segment)))
+            self.sync_directory()
+            self.since_snapshot = 0
+
+            self.compact()
+
+    def compact(self):
+        for number in self.numbers(".log"):
+            if number < self.segment:
+                os.remove(self.path(segment_name(number)))
+        for number in self.numbers(".snapshot"):
+            if number < self.segment:
+                os.remove(self.path(snapshot_name(number)))
+
+    def sync_directory(self):
+        descriptor = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(descriptor)
+        finally:
+            os.close(descriptor)
+
+    def sync(self):
+        with self.lock:
+            self._sync()
+
+    def _sync(self):
+        if self.pending:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.pending = 0
+
+    def flush_periodically(self):
+        while not self.closed.wait(self.group_interval):
+            self.sync()
+
+    def close(self):
+        self.closed.set()
+        self.flusher.join()
+        self.sync()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    directory = tempfile.mkdtemp()
+
+    accounts = {1: BankAccount(), 2: BankAccount()}
+    with CommandJournal(directory, accounts, group_size=16) as journal:
+        journal.invoke(BankAccountCommand(accounts[1], BankAccountCommand.Action.DEPOSIT, 100))
+        journal.invoke(BankAccountCommand(accounts[2], BankAccountCommand.Action.DEPOSIT, 50))
+
+        # from here on, a restart only has to replay what follows the snapshot
+        journal.snapshot()
+
+        withdrawal = BankAccountCommand(accounts[1], BankAccountCommand.Action.WITHDRAW, 30)
+        journal.invoke(withdrawal)
+        journal.undo(withdrawal)
+        journal.invoke(BankAccountCommand(accounts[2], BankAccountCommand.Action.WITHDRAW, 1000))
+    print(f"before restart: {accounts[1]}, {accounts[2]}")
+
+    # a restart starts from fresh accounts and rebuilds them from the snapshot and the log
+    restored = {1: BankAccount(), 2: BankAccount()}
+    with CommandJournal(directory, restored) as journal:
+        print(f"after replaying {journal.replayed} commands: {restored[1]}, {restored[2]}")
+    print(sorted(os.listdir(directory)))
@@ -0,0 +1,143 @@
+# Concurrent command execution
+# Commands that touch different accounts can run at the same time, so an executor runs them on a thread pool and only
+# serializes the ones sharing an account. Each command takes the locks of all its accounts before running; since the
+# locks are always taken in the same global order, two transfers going opposite ways cannot deadlock.
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor, wait
+from itertools import count
+
+from composite_command import *
+
+
+# the accounts a command touches, including those of the commands a composite or coalesced command is made of
+def accounts_of(command):
+    if isinstance(command, BankAccountCommand):
+        return [command.account]
+    if isinstance(command, list):
+        return [account for item in command for account in accounts_of(item)]
+    if isinstance(getattr(command, "commands", None), list):
+        return accounts_of(command.commands)
+    return []
+
+
+class ExecutionStats:
+    def __init__(self):
+        self.commands = 0
+        self.elapsed = 0.0
+        self.acquisitions = 0
+        # how many times a lock was already held by another command, and how long was spent waiting for it
+        self.contended = 0
+        self.wait_time = 0.0
+
+    @property
+    def throughput(self):
+        return self.commands / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (f"{self.commands} commands in {self.elapsed:.3f} s ({self.throughput:.0f}/s), "
+                f"{self.contended}/{self.acquisitions} lock acquisitions contended, "
+                f"{self.wait_time:.3f} s spent waiting")
+
+
+class ConcurrentCommandExecutor:
+    def __init__(self, workers=None):
+        self.pool = ThreadPoolExecutor(workers)
+
+        # every account gets a lock and a rank when first seen; locks are acquired by increasing rank. Accounts are
+        # held weakly, so that the locks of accounts that are gone do not pile up
+        self.locks = weakref.WeakKeyDictionary()
+        self.ranks = count()
+        self.locks_lock = threading.Lock()
+
+        self.stats = ExecutionStats()
+        self.stats_lock = threading.Lock()
+
+    def lock_for(self, account):
+        with self.locks_lock:
+            entry = self.locks.get(account)
+            if entry is None:
+                entry = self.locks[account] = (next(self.ranks), threading.Lock())
+            return entry
+
+    def run(self, command):
+        accounts = {id(account): account for account in accounts_of(command)}
+        locks = sorted(self.lock_for(account) for account in accounts.values())
+
+        acquired = []
+        contended, waited = 0, 0.0
+        try:
+            for _, lock in locks:
+                if not lock.acquire(blocking=False):
+                    start = time.perf_counter()
+                    lock.acquire()
+                    waited += time.perf_counter() - start
+                    contended += 1
+                acquired.append(lock)
+            command.invoke()
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+
+        with self.stats_lock:
+            self.stats.commands += 1
+            self.stats.acquisitions += len(locks)
+            self.stats.contended += contended
+            self.stats.wait_time += waited
+        return command
+
+    def submit(self, command):
+        return self.pool.submit(self.run, command)
+
+    # runs a batch of commands and waits for all of them; commands sharing an account run in no particular order
+    def execute(self, commands):
+        start = time.perf_counter()
+        futures = [self.submit(command) for command in commands]
+        wait(futures)
+        with self.stats_lock:
+            self.stats.elapsed += time.perf_counter() - start
+
+        # re-raise the first error, if any
+        for future in futures:
+            future.result()
+        return self.stats
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+
+if __name__ == "__main__":
+    import contextlib
+    import io
+    import random
+
+    from command_coalescing import coalesce
+
+    accounts = [BankAccount(1000) for _ in range(10)]
+    commands = []
+    deposited = 0
+    for i in range(10_000):
+        from_account, to_account = random.sample(accounts, 2)
+        commands.append(MoneyTransferCommand(from_account, to_account, random.randint(1, 200)))
+
+        # bursts of deposits, coalesced into a single command each, lock their account like any other command
+        if i % 10 == 0:
+            burst = [BankAccountCommand(to_account, BankAccountCommand.Action.DEPOSIT, 1) for _ in range(5)]
+            commands.extend(coalesce(burst))
+            deposited += len(burst)
+
+    # the accounts print every operation, which would drown the statistics
+    with ConcurrentCommandExecutor(workers=8) as executor, contextlib.redirect_stdout(io.StringIO()):
+        stats = executor.execute(commands)
+
+    print(stats)
+    print(f"total balance = {sum(account.balance for account in accounts)} "
+          f"(expected {1000 * len(accounts) + deposited}), "
+          f"lowest balance = {min(account.balance for account in accounts)}")
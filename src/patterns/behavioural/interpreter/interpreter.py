@@ -2,6 +2,8 @@
 # The interpreter pattern is a pattern used to evaluate text and convert ("interpret") it into actions or different
 # languages, regex or instructions
 
+import re
+from collections import OrderedDict
 from enum import Enum
 
 
@@ -12,100 +14,350 @@ class Token:
         MINUS = 2
         LPAREN = 3
         RPAREN = 4
+        IDENTIFIER = 5
 
-    def __init__(self, type, text):
+    def __init__(self, type, text, position=None):
         self.type = type
         self.text = text
+        # the offset of the token in the input
+        self.position = position
 
     def __str__(self):
         return f"'{self.text}'"
 
 
-# we'll start with te LEXING process, which basically splits the text into tokens
-def lex(input):
-    result = []
-
-    i = 0
-    while i < len(input):
-        if input[i] == "+":
-            result.append(Token(Token.Type.PLUS, "+"))
-        elif input[i] == "-":
-            result.append(Token(Token.Type.PLUS, "-"))
-        elif input[i] == "(":
-            result.append(Token(Token.Type.PLUS, "("))
-        elif input[i] == ")":
-            result.append(Token(Token.Type.PLUS, ")"))
-        else:
-            digits = [input[i]]
-            for j in range(i + 1, len(input)):
-                if input[j].isdigit():
-                    digits.append(input[j])
-                    i += 1
-                else:
-                    result.append(Token(Token.Type.INTEGER, "".join(digits)))
-                    break
-        i += 1
-    return result
+class LexError(ValueError):
+    def __init__(self, message, position):
+        super().__init__(message)
+        self.position = position
+
+
+# every token is one of the named groups; whitespace is skipped and any other character is an error
+TOKEN_PATTERN = re.compile(r"(?P<INTEGER>\d+)|(?P<IDENTIFIER>[A-Za-z_]\w*)|(?P<PLUS>\+)|(?P<MINUS>-)|(?P<LPAREN>\()|(?P<RPAREN>\))"
+                           r"|(?P<SPACE>\s+)|(?P<ERROR>.)", re.DOTALL)
+TRAILING_WORD = re.compile(r"\w*\Z")
+
+
+# the input can be a string, or anything with a read method such as a file or a memory-mapped file; bytes are
+# decoded as latin-1, so that positions are byte offsets
+def read_chunks(input, chunk_size):
+    if isinstance(input, str):
+        yield input
+    elif isinstance(input, (bytes, bytearray)):
+        yield input.decode("latin-1")
+    else:
+        while chunk := input.read(chunk_size):
+            yield chunk.decode("latin-1") if isinstance(chunk, (bytes, bytearray)) else chunk
+
+
+# we'll start with te LEXING process, which basically splits the text into tokens; tokens are yielded as they are
+# found, so that only a chunk of the input is held in memory at any time
+def lex(input, chunk_size=1 << 16):
+    text = ""
+    offset = 0
+    for chunk in read_chunks(input, chunk_size):
+        text += chunk
+        # a number or a name at the end of the chunk may go on in the next one, so it is kept for later
+        limit = TRAILING_WORD.search(text).start()
+        yield from lex_text(text, limit, offset)
+        offset += limit
+        text = text[limit:]
+    yield from lex_text(text, len(text), offset)
+
+
+TOKEN_TYPES = {type.name: type for type in Token.Type}
+
+
+def lex_text(text, limit, offset):
+    for match in TOKEN_PATTERN.finditer(text, 0, limit):
+        type = TOKEN_TYPES.get(match.lastgroup)
+        if type is not None:
+            yield Token(type, match.group(), offset + match.start())
+        elif match.lastgroup == "ERROR":
+            position = offset + match.start()
+            raise LexError(f"Unexpected character {match.group()!r} at position {position}", position)
 
 
 class Integer:
     def __init__(self, value):
         self.value = value
 
+
+# a name standing for a value that is only given when the expression is evaluated, see compile_expression
+class Variable:
+    def __init__(self, name):
+        self.name = name
+
+    @property
+    def value(self):
+        raise NameError(f"Variable {self.name} has no value outside of a compiled expression")
+
+
 class BinaryExpression:
     class Type(Enum):
         ADDITION = 0
         SUBTRACTION = 1
 
-    def __init__(self):
-        self.type = None
-        self.left = None
-        self.right = None
+    def __init__(self, type=None, left=None, right=None):
+        self.type = type
+        self.left = left
+        self.right = right
 
+    # the tree is walked with a stack of its own, so that its depth is not bound by the recursion limit. The walk goes
+    # down the left operands to a leaf, then back up: a right operand that is a number is combined straight away, any
+    # other is walked in turn while the value of the left operand waits on the stack next to its expression
     @property
     def value(self):
-        if self.type == self.Type.ADDITION:
-            return self.left.value + self.right.value
-        else:
-            return self.left.value - self.right.value
-
-# now we will continue defining the PARSING process, which parses tokens into a tree which will be traversed
-def parse(tokens):
-    result = BinaryExpression()
-    have_lhs = False
-    i = 0
-    while i < len(tokens):
-        token = tokens[i]
-
-        if token.type == Token.Type.INTEGER:
-            integer = Integer(int(token.text))
-            if not have_lhs:
-                result.left = integer
-                have_lhs = True
-            else:
-                result.right = integer
-        elif token.type == Token.Type.PLUS:
-            result.type = BinaryExpression.Type.ADDITION
-        elif token.type == Token.Type.MINUS:
-            result.type = BinaryExpression.Type.SUBTRACTION
-        elif token.type == Token.Type.LPAREN:
-            j = i
-            while j < len(tokens):
-                if tokens[j].type == Token.Type.RPAREN:
+        addition = BinaryExpression.Type.ADDITION
+        stack = []
+        node = self
+        while True:
+            while isinstance(node, BinaryExpression):
+                stack.append(node)
+                node = node.left
+            result = node.value
+
+            while stack:
+                top = stack[-1]
+                if type(top) is tuple:
+                    stack.pop()
+                    expression, left = top
+                    result = left + result if expression.type is addition else left - result
+                    continue
+
+                right = top.right
+                if type(right) is Integer:
+                    stack.pop()
+                    result = result + right.value if top.type is addition else result - right.value
+                else:
+                    stack[-1] = (top, result)
+                    node = right
                     break
-                j += 1
-            subexpression = tokens[i+1:j]
-            element = parse(subexpression)
-            if not have_lhs:
-                result.left = element
             else:
-                result.right = element
-            i = j
-        i += 1
-    return result
+                return result
+
+
+# the parser creates nodes through a builder; this one simply creates a new node every time
+class ExpressionBuilder:
+    def integer(self, value):
+        return Integer(value)
+
+    def variable(self, name):
+        return Variable(name)
+
+    def binary(self, type, left, right):
+        return BinaryExpression(type, left, right)
+
+
+# this builder hands out the same node for structurally identical expressions, so repeated subexpressions are built
+# only once and the result is a DAG rather than a tree. Since the children are themselves shared, two expressions are
+# identical when their children are the same objects; additions are commutative, so the order of their children does
+# not matter. Expressions whose children are both numbers are folded into a number straight away
+class DagBuilder(ExpressionBuilder):
+    def __init__(self):
+        self.nodes = {}
+
+    def intern(self, key, create):
+        node = self.nodes.get(key)
+        if node is None:
+            node = self.nodes[key] = create()
+        return node
+
+    def integer(self, value):
+        return self.intern((Integer, value), lambda: Integer(value))
+
+    def variable(self, name):
+        return self.intern((Variable, name), lambda: Variable(name))
+
+    def binary(self, type, left, right):
+        if isinstance(left, Integer) and isinstance(right, Integer):
+            if type == BinaryExpression.Type.ADDITION:
+                return self.integer(left.value + right.value)
+            return self.integer(left.value - right.value)
+
+        children = (id(left), id(right))
+        if type == BinaryExpression.Type.ADDITION:
+            children = tuple(sorted(children))
+        return self.intern((type,) + children, lambda: BinaryExpression(type, left, right))
+
+
+class ParseError(ValueError):
+    def __init__(self, message, position):
+        super().__init__(message)
+        self.position = position
+
+
+# the binary operators, with the type of expression they build and their precedence; operators of the same
+# precedence are left associative
+BINARY_OPERATORS = {
+    Token.Type.PLUS: (BinaryExpression.Type.ADDITION, 1),
+    Token.Type.MINUS: (BinaryExpression.Type.SUBTRACTION, 1),
+}
+
+
+# now we will continue defining the PARSING process, which parses tokens into a tree which will be traversed.
+# The tokens are read one at a time, so they can come straight from lex without being collected first. Operands and
+# the operators waiting for their right operand are kept on two stacks: before pushing an operator, the ones on the
+# stack that bind at least as tightly are applied to the operands, and a ')' applies everything back to its '('.
+# Nesting only grows the stacks, so it is not bound by the recursion limit.
+def parse(tokens, builder=ExpressionBuilder()):
+    operands = []
+    operators = []
+    expect_operand = True
+    position = 0
+
+    def reduce():
+        right = operands.pop()
+        left = operands.pop()
+        operands.append(builder.binary(operators.pop()[0], left, right))
+
+    for token in tokens:
+        position = token.position
+        if expect_operand:
+            if token.type == Token.Type.INTEGER:
+                operands.append(builder.integer(int(token.text)))
+                expect_operand = False
+            elif token.type == Token.Type.IDENTIFIER:
+                operands.append(builder.variable(token.text))
+                expect_operand = False
+            elif token.type == Token.Type.LPAREN:
+                operators.append(token)
+            else:
+                raise ParseError(f"Expected a number, a variable or '(' at position {position}, got {token}", position)
+        elif token.type in BINARY_OPERATORS:
+            operator = BINARY_OPERATORS[token.type]
+            while operators and not isinstance(operators[-1], Token) and operators[-1][1] >= operator[1]:
+                reduce()
+            operators.append(operator)
+            expect_operand = True
+        elif token.type == Token.Type.RPAREN:
+            while operators and not isinstance(operators[-1], Token):
+                reduce()
+            if not operators:
+                raise ParseError(f"Unmatched ')' at position {position}", position)
+            operators.pop()
+        else:
+            raise ParseError(f"Expected an operator or ')' at position {position}, got {token}", position)
+
+    if expect_operand:
+        raise ParseError(f"Unexpected end of input after position {position}", position)
+    while operators:
+        if isinstance(operators[-1], Token):
+            position = operators[-1].position
+            raise ParseError(f"Unclosed '(' at position {position}", position)
+        reduce()
+    return operands[0]
+
+# yields the nodes of a tree children first, using a stack of its own rather than recursion; in a DAG, a node shared
+# by several expressions is only yielded once
+def postorder(root):
+    stack = [(root, False)]
+    seen = set()
+    while stack:
+        node, expanded = stack.pop()
+        if expanded:
+            yield node
+        elif id(node) not in seen:
+            seen.add(id(node))
+            if isinstance(node, BinaryExpression):
+                stack.append((node, True))
+                stack.append((node.right, False))
+                stack.append((node.left, False))
+            else:
+                yield node
+
+
+OPERATORS = {
+    BinaryExpression.Type.ADDITION: "+",
+    BinaryExpression.Type.SUBTRACTION: "-",
+}
+
+
+# compiling turns a tree into a Python function computing it: every binary expression becomes one statement, in the
+# order they would be evaluated, storing its result in a local variable. Once a result has been used, its variable
+# is reused for a later one, so the function only needs as many variables as there are intermediate results alive.
+# The function takes the values of the variables as a mapping from their names; since it only adds and subtracts
+# them, those values can be whole NumPy arrays as well as numbers, and the expression is then computed column-wise.
+# A node shared by several expressions of a DAG is computed once, and its variable is kept until its last use
+def compile_expression(tree):
+    nodes = list(postorder(tree))
+    uses = {}
+    for node in nodes:
+        if isinstance(node, BinaryExpression):
+            uses[id(node.left)] = uses.get(id(node.left), 0) + 1
+            uses[id(node.right)] = uses.get(id(node.right), 0) + 1
+
+    lines = []
+    operands = {}
+    variables = {}
+    temporaries = set()
+    free = []
+    for node in nodes:
+        if isinstance(node, Integer):
+            operands[id(node)] = repr(node.value) if node.value >= 0 else f"({node.value})"
+            continue
+        if isinstance(node, Variable):
+            if node.name not in variables:
+                variables[node.name] = f"v{len(variables)}"
+                lines.insert(len(variables) - 1, f"    {variables[node.name]} = variables[{node.name!r}]")
+            operands[id(node)] = variables[node.name]
+            continue
+
+        left, right = operands[id(node.left)], operands[id(node.right)]
+        for child, operand in ((node.left, left), (node.right, right)):
+            uses[id(child)] -= 1
+            if uses[id(child)] == 0 and operand in temporaries:
+                free.append(operand)
+        target = free.pop() if free else f"t{len(temporaries)}"
+        temporaries.add(target)
+        lines.append(f"    {target} = {left} {OPERATORS[node.type]} {right}")
+        operands[id(node)] = target
+
+    lines.append(f"    return {operands[id(tree)]}")
+    source = "def expression(variables=None):\n" + "".join(line + "\n" for line in lines)
+    namespace = {"__builtins__": {}}
+    exec(compile(source, "<expression>", "exec"), namespace)
+    return namespace["expression"]
+
+
+# a least recently used cache of compiled expressions, keyed by their text
+class ExpressionCache:
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, text):
+        expression = self.entries.get(text)
+        if expression is not None:
+            self.entries.move_to_end(text)
+            self.hits += 1
+            return expression
+
+        self.misses += 1
+        # the expression is built as a DAG, so that repeated subexpressions are computed once by the compiled function
+        expression = self.entries[text] = compile_expression(parse(lex(text), DagBuilder()))
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return expression
+
+    def __str__(self):
+        return f"{len(self.entries)} expressions cached, {self.hits} hits, {self.misses} misses, " \
+               f"{self.evictions} evictions"
+
+
+expression_cache = ExpressionCache()
+
+
+def evaluate(text, variables=None, cache=expression_cache):
+    return cache.get(text)(variables)
+
 
 def calc(input):
-    tokens = lex(input)
+    tokens = list(lex(input))
     print(" ".join(map(str, tokens)))
 
     parsed = parse(tokens)
@@ -114,3 +366,16 @@ def calc(input):
 
 if __name__ == "__main__":
     calc('(13+4)-(12+1)')
+
+    # evaluating the same expressions again only runs their compiled functions
+    cache = ExpressionCache(maxsize=2)
+    for text in ['(13+4)-(12+1)', '1+2+3', '(13+4)-(12+1)', '10-(2-3)', '1+2+3']:
+        print(f"{text} = {evaluate(text, cache=cache)}")
+    print(cache)
+
+    print(f"price - (discount + 1) = {evaluate('price - (discount + 1)', {'price': 20, 'discount': 5})}")
+
+    # the repeated (a + b) is built once, and (2 + 3) is folded into 5
+    builder = DagBuilder()
+    dag = parse(lex('((a + b) - (2 + 3)) + ((b + a) - (2 + 3))'), builder)
+    print(f"{len(builder.nodes)} distinct nodes, the two halves are {'the same' if dag.left is dag.right else 'different'}")
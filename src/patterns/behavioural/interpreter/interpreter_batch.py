@@ -0,0 +1,69 @@
+# Batch evaluation of expressions
+# Expressions are read one per line from a file or stdin, sent in chunks to a pool of worker processes, and their
+# results are written in the same order as the input, one per line. Only a few chunks per worker are in flight at any
+# time, so the input is streamed rather than read all at once.
+import argparse
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from interpreter import *
+
+
+# runs in the worker processes; an expression that cannot be evaluated gives an error line instead of a result
+def evaluate_chunk(lines):
+    results = []
+    for line in lines:
+        if not line.strip():
+            results.append("")
+            continue
+        try:
+            results.append(str(parse(lex(line)).value))
+        except (ValueError, NameError) as e:
+            results.append(f"error: {e}")
+    return results
+
+
+def batch_calc(input, output, workers=None, chunk_size=1000):
+    workers = workers or os.cpu_count()
+    lines = (line.rstrip("\n") for line in input)
+    chunks = iter(lambda: list(islice(lines, chunk_size)), [])
+
+    count = 0
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+
+        def write_oldest():
+            nonlocal count
+            results = pending.popleft().result()
+            output.write("".join(result + "\n" for result in results))
+            count += len(results)
+
+        for chunk in chunks:
+            pending.append(pool.submit(evaluate_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                write_oldest()
+        while pending:
+            write_oldest()
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate one expression per line, in parallel.")
+    parser.add_argument("input", nargs="?", default="-", help="file to read the expressions from, - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="file to write the results to, - for stdout")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="number of worker processes")
+    parser.add_argument("-c", "--chunk-size", type=int, default=1000, help="expressions sent to a worker at once")
+    args = parser.parse_args()
+
+    input = sys.stdin if args.input == "-" else open(args.input)
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        batch_calc(input, output, args.workers, args.chunk_size)
+    finally:
+        if input is not sys.stdin:
+            input.close()
+        if output is not sys.stdout:
+            output.close()
@@ -0,0 +1,79 @@
+# Benchmark for the interpreter
+# Lexing and parsing should take linear time in the number of tokens, whatever the shape of the expression: long
+# sums, deeply nested parentheses, or both. Evaluating the parsed tree should take linear time in its size, whatever
+# its depth.
+import random
+import time
+
+from interpreter import *
+
+
+def long_sum(tokens):
+    return "+".join(str(i % 100) for i in range(tokens // 2 + 1))
+
+
+def deep_nesting(tokens):
+    depth = (tokens - 1) // 2
+    return "(" * depth + "1" + ")" * depth
+
+
+def random_expression(tokens, seed=0):
+    rng = random.Random(seed)
+    parts, depth = [], 0
+    while len(parts) < tokens:
+        if rng.random() < 0.3:
+            parts.append("(")
+            depth += 1
+        parts.append(str(rng.randint(0, 999)))
+        while depth and rng.random() < 0.3:
+            parts.append(")")
+            depth -= 1
+        parts.append(rng.choice("+-"))
+    parts[-1] = ")" * depth
+    return "".join(parts)
+
+
+def measure(text):
+    start = time.perf_counter()
+    tokens = list(lex(text))
+    lexed = time.perf_counter()
+    tree = parse(tokens)
+    parsed = time.perf_counter()
+    tree.value
+    evaluated = time.perf_counter()
+    return len(tokens), lexed - start, parsed - lexed, evaluated - parsed
+
+
+# how BinaryExpression.value used to be computed, calling itself on both operands
+def recursive_value(node):
+    if isinstance(node, Integer):
+        return node.value
+    if node.type == BinaryExpression.Type.ADDITION:
+        return recursive_value(node.left) + recursive_value(node.right)
+    return recursive_value(node.left) - recursive_value(node.right)
+
+
+# a balanced tree is shallow enough for the recursive evaluation to cope with
+def balanced_tree(depth):
+    level = [Integer(i % 100) for i in range(2 ** depth)]
+    while len(level) > 1:
+        level = [BinaryExpression(BinaryExpression.Type.ADDITION, level[i], level[i + 1])
+                 for i in range(0, len(level), 2)]
+    return level[0]
+
+
+if __name__ == "__main__":
+    for name, build in (("long sum", long_sum), ("deep nesting", deep_nesting), ("random", random_expression)):
+        for size in (10 ** 4, 10 ** 5, 10 ** 6):
+            tokens, lexing, parsing, evaluating = measure(build(size))
+            print(f"{name:>12}: {tokens:>8} tokens lexed in {lexing:.3f} s, parsed in {parsing:.3f} s, "
+                  f"evaluated in {evaluating:.3f} s")
+
+    tree = balanced_tree(20)
+    start = time.perf_counter()
+    recursive_value(tree)
+    recursive = time.perf_counter() - start
+    start = time.perf_counter()
+    tree.value
+    print(f"balanced tree of {2 ** 21 - 1} nodes evaluated in {recursive:.3f} s recursively, "
+          f"{time.perf_counter() - start:.3f} s with a stack")
@@ -0,0 +1,42 @@
+# Column-wise evaluation of expressions
+# A compiled expression only adds and subtracts the values of its variables, so binding every variable to a whole
+# NumPy column computes the expression for all the rows of a table at once, with one array operation per binary
+# expression instead of one Python evaluation per row.
+import numpy as np
+
+from interpreter import *
+
+
+# expression is either the text of an expression, compiled through the cache, or an already parsed tree; the result
+# always has one value per row, even when the expression has no variables
+def evaluate_columns(expression, columns, cache=expression_cache):
+    if isinstance(expression, str):
+        compiled = cache.get(expression)
+    else:
+        compiled = compile_expression(expression)
+
+    columns = {name: np.asarray(column) for name, column in columns.items()}
+    rows = len(next(iter(columns.values()))) if columns else 1
+    result = np.asarray(compiled(columns))
+    if result.shape != (rows,):
+        result = np.broadcast_to(result, (rows,)).copy()
+    return result
+
+
+if __name__ == "__main__":
+    import time
+
+    table = {
+        "price": np.array([20, 35, 50]),
+        "discount": np.array([5, 0, 10]),
+        "shipping": np.array([3, 3, 0]),
+    }
+    print(evaluate_columns("price - discount + shipping", table))
+    print(evaluate_columns("(1 + 2) - 1", table))
+
+    rows = 10_000_000
+    rng = np.random.default_rng(0)
+    table = {name: rng.integers(0, 1000, rows) for name in ("a", "b", "c", "d")}
+    start = time.perf_counter()
+    evaluate_columns("(a + b) - (c - d) + 1 - a", table)
+    print(f"{rows} rows evaluated in {time.perf_counter() - start:.3f} s")
@@ -0,0 +1,221 @@
+# Array-backed trees
+# A Node is a whole Python object with its own __dict__, which costs a couple of hundred bytes per node. An ArrayTree
+# keeps the same structure in parallel arrays instead: node i has the value values[i], the children left[i] and
+# right[i], and the parent parent[i], where -1 stands for no node. With machine integers for the indices and the values
+# a node takes 20 bytes, and a traversal reads contiguous memory rather than chasing pointers from object to object.
+# Iterating over the values alone is faster than over a Node tree; the iterators also create a small view per node.
+from array import array
+
+NO_NODE = -1
+
+
+# what the iterators yield: a view of node index of tree, with the same attributes as a Node. Views are created on
+# demand and hold nothing but the tree and the index, so they cost nothing while the tree is stored
+class NodeView:
+    __slots__ = ("tree", "index")
+
+    def __init__(self, tree, index):
+        self.tree = tree
+        self.index = index
+
+    @property
+    def value(self):
+        return self.tree.values[self.index]
+
+    @property
+    def left(self):
+        return self.tree.node(self.tree.left[self.index])
+
+    @property
+    def right(self):
+        return self.tree.node(self.tree.right[self.index])
+
+    @property
+    def parent(self):
+        return self.tree.node(self.tree.parent[self.index])
+
+    def __eq__(self, other):
+        return isinstance(other, NodeView) and self.tree is other.tree and self.index == other.index
+
+    def __hash__(self):
+        return hash((id(self.tree), self.index))
+
+    # as for a Node, iterating over a view goes in order through its subtree
+    def __iter__(self):
+        return ArrayInOrderIterator(self.tree, self.index)
+
+    def __repr__(self):
+        return f"NodeView({self.value!r})"
+
+
+class ArrayTree:
+    # typecode is the array type of the values; None stores them in a list, so that they can be any object
+    def __init__(self, typecode="q"):
+        self.values = array(typecode) if typecode else []
+        self.left = array("i")
+        self.right = array("i")
+        self.parent = array("i")
+        self.root = NO_NODE
+
+    # adds a node whose children are nodes already in the tree, and returns its index; as with Node, the tree is built
+    # bottom-up, so the node added last is the root
+    def add(self, value, left=NO_NODE, right=NO_NODE):
+        index = len(self.parent)
+        self.values.append(value)
+        self.left.append(left)
+        self.right.append(right)
+        self.parent.append(NO_NODE)
+        if left != NO_NODE:
+            self.parent[left] = index
+        if right != NO_NODE:
+            self.parent[right] = index
+        self.root = index
+        return index
+
+    # builds a balanced tree of sorted values, laid out in order: node i holds values[i], so an in-order traversal
+    # reads the arrays from start to end. The ranges still to be split are kept on a stack rather than in recursive
+    # calls, so the size of the tree is only limited by memory
+    @classmethod
+    def from_sorted(cls, values, typecode="q"):
+        tree = cls(typecode)
+        tree.values.extend(values)
+        size = len(tree.values)
+        tree.left = array("i", [NO_NODE]) * size
+        tree.right = array("i", [NO_NODE]) * size
+        tree.parent = array("i", [NO_NODE]) * size
+        if not size:
+            return tree
+
+        tree.root = size // 2
+        stack = [(0, size, tree.root)]
+        while stack:
+            start, stop, middle = stack.pop()
+            if start < middle:
+                child = (start + middle) // 2
+                tree.left[middle] = child
+                tree.parent[child] = middle
+                stack.append((start, middle, child))
+            if middle + 1 < stop:
+                child = (middle + 1 + stop) // 2
+                tree.right[middle] = child
+                tree.parent[child] = middle
+                stack.append((middle + 1, stop, child))
+        return tree
+
+    def __len__(self):
+        return len(self.parent)
+
+    def node(self, index):
+        return None if index == NO_NODE else NodeView(self, index)
+
+    def __iter__(self):
+        return ArrayInOrderIterator(self, self.root)
+
+    # the values alone, in order, without creating a view per node
+    def values_in_order(self):
+        values = self.values
+        for index in in_order_indices(self, self.root):
+            yield values[index]
+
+
+class ArrayInOrderIterator:
+    def __init__(self, tree, root):
+        self.tree = tree
+        self.indices = in_order_indices(tree, root)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return NodeView(self.tree, next(self.indices))
+
+
+# the same walk through the parent links as InOrderIterator, over indices, stopping when it leaves the subtree of root
+def in_order_indices(tree, root):
+    left, right, parent = tree.left, tree.right, tree.parent
+    current = root
+    if current == NO_NODE:
+        return
+    while left[current] != NO_NODE:
+        current = left[current]
+    while True:
+        yield current
+        if right[current] != NO_NODE:
+            current = right[current]
+            while left[current] != NO_NODE:
+                current = left[current]
+        else:
+            while current != root and current == right[parent[current]]:
+                current = parent[current]
+            if current == root:
+                return
+            current = parent[current]
+
+
+class ArrayPreOrderIterator:
+    def __init__(self, tree, root):
+        self.tree = tree
+        self.stack = array("i", [root] if root != NO_NODE else [])
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.stack:
+            raise StopIteration
+        index = self.stack.pop()
+        if self.tree.right[index] != NO_NODE:
+            self.stack.append(self.tree.right[index])
+        if self.tree.left[index] != NO_NODE:
+            self.stack.append(self.tree.left[index])
+        return NodeView(self.tree, index)
+
+
+def traverse_in_order(tree):
+    return ArrayInOrderIterator(tree, tree.root)
+
+
+def traverse_preorder(tree):
+    return ArrayPreOrderIterator(tree, tree.root)
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    from iterator import Node, InOrderIterator
+
+    #   1
+    #  / \
+    # 2   3
+    tree = ArrayTree()
+    tree.add(1, tree.add(2), tree.add(3))
+
+    print([x.value for x in traverse_in_order(tree)])
+    print([x.value for x in traverse_preorder(tree)])
+
+    # a million nodes as Node objects and as arrays
+    size = 10 ** 6
+    tree = ArrayTree.from_sorted(range(size))
+    stored = sum(sys.getsizeof(a) for a in (tree.values, tree.left, tree.right, tree.parent))
+    print(f"array tree: {stored / size:.1f} bytes per node")
+
+    level = [Node(i) for i in range(size)]
+    node = level[0]
+    per_node = sys.getsizeof(node) + sys.getsizeof(node.__dict__) + sys.getsizeof(node.value)
+    print(f"Node tree: at least {per_node} bytes per node")
+    while len(level) > 1:
+        level = [Node(0, *level[i:i + 2]) for i in range(0, len(level), 2)]
+
+    start = time.perf_counter()
+    for _ in InOrderIterator(level[0]):
+        pass
+    print(f"Node tree traversed in {time.perf_counter() - start:.3f} s")
+    start = time.perf_counter()
+    for _ in traverse_in_order(tree):
+        pass
+    print(f"array tree traversed in {time.perf_counter() - start:.3f} s")
+    start = time.perf_counter()
+    for _ in tree.values_in_order():
+        pass
+    print(f"array tree values traversed in {time.perf_counter() - start:.3f} s")
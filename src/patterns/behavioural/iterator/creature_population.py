@@ -0,0 +1,88 @@
+# Creature population
+# The stats of a whole population of creatures are kept in one 2-D NumPy array, one row per creature and one column
+# per stat, in the same order as the indices of Creature. A creature of the population is a view of its row: it has
+# the same properties as any Creature, and changing them changes the array. The aggregates of all the creatures are
+# computed at once, with one array operation over all the rows instead of one sum or max per creature.
+import numpy as np
+
+from list_backed_properties import Creature
+
+
+class CreatureView(Creature):
+    def __init__(self, population, index):
+        self.population = population
+        self.index = index
+        self.stats = population.stats[index]
+
+
+class CreaturePopulation:
+    def __init__(self, size, dtype=np.int64):
+        self.stats = np.full((size, 3), 10, dtype=dtype)
+
+    @classmethod
+    def from_creatures(cls, creatures, dtype=np.int64):
+        population = cls(0, dtype)
+        population.stats = np.array([creature.stats for creature in creatures], dtype=dtype).reshape(-1, 3)
+        return population
+
+    def __len__(self):
+        return len(self.stats)
+
+    def __getitem__(self, index):
+        if not -len(self) <= index < len(self):
+            raise IndexError("creature index out of range")
+        return CreatureView(self, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield CreatureView(self, index)
+
+    # one stat of every creature, as a view of its column
+    @property
+    def strength(self):
+        return self.stats[:, Creature._strength]
+
+    @property
+    def agility(self):
+        return self.stats[:, Creature._agility]
+
+    @property
+    def intelligence(self):
+        return self.stats[:, Creature._intelligence]
+
+    # the aggregates of Creature, one per creature
+    @property
+    def sum_of_stats(self):
+        return self.stats.sum(axis=1)
+
+    @property
+    def max_stat(self):
+        return self.stats.max(axis=1)
+
+    @property
+    def average_stats(self):
+        return self.stats.mean(axis=1)
+
+
+if __name__ == "__main__":
+    import time
+
+    population = CreaturePopulation(3)
+    population[0].strength = 20
+    population[1].agility = 5
+    population.intelligence[2] = 17
+    print(population.sum_of_stats, population.max_stat, population.average_stats)
+    print([int(creature.sum_of_stats) for creature in population])
+
+    size = 10 ** 6
+    creatures = [Creature() for _ in range(size)]
+    population = CreaturePopulation.from_creatures(creatures)
+
+    start = time.perf_counter()
+    totals = [creature.sum_of_stats for creature in creatures]
+    print(f"{size} creatures summed one by one in {time.perf_counter() - start:.3f} s")
+    start = time.perf_counter()
+    population.sum_of_stats
+    population.max_stat
+    population.average_stats
+    print(f"{size} creatures summed, maxed and averaged at once in {time.perf_counter() - start:.3f} s")
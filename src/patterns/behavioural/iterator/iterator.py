@@ -1,6 +1,8 @@
 # Iterator Pattern
 # The iterator pattern is used to traverse various data structures. It is used to provide a way to access and iterate
 # an underlying data structure without exposing its internal representation. Iterator facilitates the traversal.
+from collections import deque
+
 
 class Node:
     def __init__(self, value, left=None, right=None):
@@ -19,6 +21,13 @@ class Node:
         return InOrderIterator(self)
 
 
+# the traversals below are iterator objects keeping their position in the tree, rather than recursive generators: a
+# recursive generator hands every node up through the generator of each of its ancestors, so it costs O(depth) per
+# node, and it cannot go deeper than the recursion limit. Each of these does O(1) amortized work per node instead
+
+
+# the in-order iterator finds its way through the parent links, so it needs no memory besides the current node; it
+# stops once it has gone through the subtree of root, even if root has a parent
 class InOrderIterator:
     def __init__(self, root):
         self.root = self.current = root
@@ -26,41 +35,114 @@ class InOrderIterator:
         while self.current.left:
             self.current = self.current.left
 
+    def __iter__(self):
+        return self
+
     # this is used to move from one element to another
     def __next__(self):
         if not self.yielded_start:
             self.yielded_start = True
             return self.current
 
+        if self.current is None:
+            raise StopIteration
+
         if self.current.right:
             self.current = self.current.right
             while self.current.left:
                 self.current = self.current.left
             return self.current
         else:
+            # climbing back up from a right subtree, without leaving the subtree of root
             p = self.current.parent
-            while p and self.current == p.right:
+            while p and self.current is not self.root and self.current is p.right:
                 self.current = p
                 p = p.parent
-            self.current = p
+            self.current = None if self.current is self.root else p
             if self.current:
                 return self.current
             else:
                 raise StopIteration
 
 
+# the other iterators keep the nodes still to be visited on a stack (or a queue)
+class PreOrderIterator:
+    def __init__(self, root):
+        self.stack = [root]
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.stack:
+            raise StopIteration
+        node = self.stack.pop()
+        if node.right:
+            self.stack.append(node.right)
+        if node.left:
+            self.stack.append(node.left)
+        return node
+
+
+class PostOrderIterator:
+    def __init__(self, root):
+        self.stack = []
+        self.current = root
+        self.last = None
+
+    def __iter__(self):
+        return self
+
+    # a node is only returned once its right subtree, if any, has been returned
+    def __next__(self):
+        while self.current or self.stack:
+            if self.current:
+                self.stack.append(self.current)
+                self.current = self.current.left
+                continue
+
+            node = self.stack[-1]
+            if node.right and self.last is not node.right:
+                self.current = node.right
+            else:
+                self.stack.pop()
+                self.last = node
+                return node
+        raise StopIteration
+
+
+class LevelOrderIterator:
+    def __init__(self, root):
+        self.queue = deque([root])
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.queue:
+            raise StopIteration
+        node = self.queue.popleft()
+        if node.left:
+            self.queue.append(node.left)
+        if node.right:
+            self.queue.append(node.right)
+        return node
+
+
 def traverse_in_order(root):
-    def traverse(current):
-        if current.left:
-            for left in traverse(current.left):
-                yield left
-        yield current
-        if current.right:
-            for right in traverse(current.right):
-                yield right
+    return InOrderIterator(root)
+
+
+def traverse_preorder(root):
+    return PreOrderIterator(root)
 
-    for node in traverse(root):
-        yield node
+
+def traverse_postorder(root):
+    return PostOrderIterator(root)
+
+
+def traverse_level_order(root):
+    return LevelOrderIterator(root)
 
 
 if __name__ == "__main__":
@@ -84,3 +166,7 @@ if __name__ == "__main__":
 
     for y in traverse_in_order(root):
         print(y.value)
+
+    print([x.value for x in traverse_preorder(root)])
+    print([x.value for x in traverse_postorder(root)])
+    print([x.value for x in traverse_level_order(root)])
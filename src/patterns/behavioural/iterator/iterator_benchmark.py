@@ -0,0 +1,80 @@
+# Benchmark for the tree iterators
+# The recursive generators the traversals used to be written with pass every node up through one generator per
+# ancestor, so traversing a skewed tree takes quadratic time, and anything deeper than the recursion limit cannot be
+# traversed at all. The iterators take linear time whatever the shape of the tree.
+import sys
+import time
+
+from iterator import *
+
+
+# how the traversals used to be written
+def recursive_in_order(root):
+    def traverse(current):
+        if current.left:
+            for left in traverse(current.left):
+                yield left
+        yield current
+        if current.right:
+            for right in traverse(current.right):
+                yield right
+
+    for node in traverse(root):
+        yield node
+
+
+def recursive_preorder(root):
+    def traverse(current):
+        yield current
+        if current.left:
+            for left in traverse(current.left):
+                yield left
+        if current.right:
+            for right in traverse(current.right):
+                yield right
+
+    for node in traverse(root):
+        yield node
+
+
+# every node is the left child of the next one, so the depth of the tree is its size
+def skewed_tree(size):
+    root = Node(0)
+    for i in range(1, size):
+        root = Node(i, root)
+    return root
+
+
+def balanced_tree(depth):
+    level = [Node(i) for i in range(2 ** depth)]
+    while len(level) > 1:
+        level = [Node(0, level[i], level[i + 1]) for i in range(0, len(level), 2)]
+    return level[0]
+
+
+def measure(traversal, root):
+    start = time.perf_counter()
+    for _ in traversal(root):
+        pass
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    # the recursive generators only get a tree shallow enough for the recursion limit
+    size = sys.getrecursionlimit() - 100
+    tree = skewed_tree(size)
+    for name, recursive, iterative in (("in-order", recursive_in_order, traverse_in_order),
+                                       ("pre-order", recursive_preorder, traverse_preorder)):
+        print(f"{name:>11}: skewed tree of {size} nodes traversed in {measure(recursive, tree):.4f} s recursively, "
+              f"{measure(iterative, tree):.4f} s with the iterator")
+
+    tree = skewed_tree(10 ** 6)
+    for name, traversal in (("in-order", traverse_in_order), ("pre-order", traverse_preorder),
+                            ("post-order", traverse_postorder), ("level-order", traverse_level_order)):
+        print(f"{name:>11}: skewed tree of {10 ** 6} nodes traversed in {measure(traversal, tree):.3f} s")
+
+    tree = balanced_tree(20)
+    for name, recursive, iterative in (("in-order", recursive_in_order, traverse_in_order),
+                                       ("pre-order", recursive_preorder, traverse_preorder)):
+        print(f"{name:>11}: balanced tree of {2 ** 21 - 1} nodes traversed in {measure(recursive, tree):.3f} s "
+              f"recursively, {measure(iterative, tree):.3f} s with the iterator")
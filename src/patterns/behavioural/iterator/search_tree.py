@@ -0,0 +1,343 @@
+# Search tree
+# An AVL tree made of Node objects, kept sorted by value: the heights of the two subtrees of any node differ by at most
+# one, so the tree is O(log n) deep and inserting, removing and finding a value take O(log n) time. Nodes keep their
+# parent links, so the InOrderIterator can walk the tree as usual, and a range of values can be iterated from the first
+# one in the range, without touching the nodes before it or after its end.
+#
+# Iterating over the tree while it changes is not safe: the tree counts its changes, and an iterator raises an error
+# as soon as it sees that the tree changed since it was created, rather than yielding the wrong nodes. Readers that
+# need to iterate while a writer changes the tree take a snapshot instead: the nodes of the tree are copied on write,
+# so the nodes a snapshot sees are never changed, and only the nodes on the paths changed since are ever copied.
+import threading
+
+from iterator import *
+
+
+class ConcurrentModificationError(RuntimeError):
+    pass
+
+
+# epoch is the epoch of the tree when the node was created: once a snapshot has been taken, the epoch of the tree goes
+# up, and the node is copied before it is changed
+class SearchNode(Node):
+    def __init__(self, value, epoch=0):
+        super().__init__(value)
+        self.height = 1
+        self.epoch = epoch
+
+
+def height(node):
+    return node.height if node else 0
+
+
+# iterates in order from the node first, up to the first node whose value is not less than stop (to the end if None);
+# if tree is given, it raises a ConcurrentModificationError if the tree changes during the iteration. Unlike the
+# InOrderIterator, it climbs out of the subtree of first to go on with the rest of the tree, so it has no root
+class RangeIterator(InOrderIterator):
+    def __init__(self, first, stop=None, tree=None):
+        self.root = None
+        self.current = first
+        self.yielded_start = False
+        self.stop = stop
+        self.tree = tree
+        self.version = tree.version if tree is not None else None
+
+    def __next__(self):
+        if self.tree is not None and self.tree.version != self.version:
+            raise ConcurrentModificationError("the tree changed during the iteration")
+        if self.current is None:
+            raise StopIteration
+        node = super().__next__()
+        if self.stop is not None and not node.value < self.stop:
+            self.current = None
+            raise StopIteration
+        return node
+
+
+# the nodes of a snapshot never change, so it is iterated with a stack rather than through the parent links, which
+# belong to the current version of the tree
+class SnapshotIterator:
+    def __init__(self, root, start=None, stop=None):
+        self.stack = []
+        self.stop = stop
+        node = root
+        while node:
+            if start is not None and node.value < start:
+                node = node.right
+            else:
+                self.stack.append(node)
+                node = node.left
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.stack:
+            raise StopIteration
+        node = self.stack.pop()
+        if self.stop is not None and not node.value < self.stop:
+            self.stack.clear()
+            raise StopIteration
+        child = node.right
+        while child:
+            self.stack.append(child)
+            child = child.left
+        return node
+
+
+class Snapshot:
+    def __init__(self, root, size, version):
+        self.root = root
+        self.size = size
+        self.version = version
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return SnapshotIterator(self.root)
+
+    def range(self, start=None, stop=None):
+        return SnapshotIterator(self.root, start, stop)
+
+
+# equal values are allowed; they are kept in the order they were inserted
+class SearchTree:
+    def __init__(self, values=()):
+        self.root = None
+        self.size = 0
+        self.version = 0
+        self.epoch = 0
+        # held by the writers, and while taking a snapshot, so that a snapshot never sees half of a change
+        self.lock = threading.Lock()
+        for value in values:
+            self.insert(value)
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return self.range()
+
+    def __contains__(self, value):
+        return self.find(value) is not None
+
+    # the first node whose value is not less than value, None if there is none
+    def lower_bound(self, value):
+        result, current = None, self.root
+        while current:
+            if current.value < value:
+                current = current.right
+            else:
+                result = current
+                current = current.left
+        return result
+
+    def find(self, value):
+        node = self.lower_bound(value)
+        return node if node and not value < node.value else None
+
+    def first(self):
+        node = self.root
+        while node and node.left:
+            node = node.left
+        return node
+
+    # iterates over the nodes with start <= value < stop; either bound can be None
+    def range(self, start=None, stop=None):
+        return RangeIterator(self.first() if start is None else self.lower_bound(start), stop, self)
+
+    # the current version of the tree, which can be iterated from any thread while the tree keeps changing
+    def snapshot(self):
+        with self.lock:
+            self.epoch += 1
+            return Snapshot(self.root, self.size, self.version)
+
+    def insert(self, value):
+        with self.lock:
+            self.version += 1
+            return self.insert_node(value)
+
+    def insert_node(self, value):
+        parent, current = None, self.root
+        while current:
+            parent = current
+            current = current.left if value < current.value else current.right
+
+        node = SearchNode(value, self.epoch)
+        if parent is None:
+            self.root = node
+        elif value < parent.value:
+            parent = self.set_left(parent, node)
+        else:
+            parent = self.set_right(parent, node)
+        self.size += 1
+        self.rebalance(parent)
+        return node
+
+    # removes the first node holding value; raises KeyError if there is none
+    def remove(self, value):
+        with self.lock:
+            self.remove_node(value)
+            self.version += 1
+
+    def remove_node(self, value):
+        node = self.find(value)
+        if node is None:
+            raise KeyError(value)
+
+        # a node with two children takes the value of its successor, which has no left child, and the successor goes
+        if node.left and node.right:
+            successor = node.right
+            while successor.left:
+                successor = successor.left
+            self.set_value(node, successor.value)
+            node = successor
+
+        parent = self.replace(node, node.left or node.right)
+        self.size -= 1
+        self.rebalance(parent)
+
+    # every change to the tree goes through the methods below, which change the node returned by writable and return
+    # it, so the callers must go on with the returned node rather than the one they passed
+
+    # node itself if it was created since the last snapshot, otherwise a copy of it, which takes its place in the tree
+    # along with copies of its ancestors. Only the parent links of the children are changed: they are not part of any
+    # snapshot
+    def writable(self, node):
+        if node.epoch == self.epoch:
+            return node
+
+        parent = self.writable(node.parent) if node.parent else None
+        copy = SearchNode(node.value, self.epoch)
+        copy.height = node.height
+        copy.left, copy.right = node.left, node.right
+        for child in (node.left, node.right):
+            if child:
+                child.parent = copy
+
+        copy.parent = parent
+        if parent is None:
+            self.root = copy
+        elif parent.left is node:
+            parent.left = copy
+        else:
+            parent.right = copy
+        return copy
+
+    def set_value(self, node, value):
+        node = self.writable(node)
+        node.value = value
+        return node
+
+    def set_left(self, node, child):
+        node = self.writable(node)
+        node.left = child
+        if child:
+            child.parent = node
+        return node
+
+    def set_right(self, node, child):
+        node = self.writable(node)
+        node.right = child
+        if child:
+            child.parent = node
+        return node
+
+    # puts child where node was, under the parent of node or as the root, and returns the parent
+    def replace(self, node, child):
+        parent = node.parent
+        if parent is None:
+            self.root = child
+            if child:
+                child.parent = None
+            return None
+        elif parent.left is node:
+            return self.set_left(parent, child)
+        else:
+            return self.set_right(parent, child)
+
+    def update_height(self, node):
+        node = self.writable(node)
+        node.height = 1 + max(height(node.left), height(node.right))
+        return node
+
+    # making the child writable makes node and its ancestors writable too
+    def rotate_left(self, node):
+        child = self.writable(node.right)
+        node = child.parent
+        self.set_right(node, child.left)
+        self.replace(node, child)
+        self.set_left(child, node)
+        self.update_height(node)
+        self.update_height(child)
+        return child
+
+    def rotate_right(self, node):
+        child = self.writable(node.left)
+        node = child.parent
+        self.set_left(node, child.right)
+        self.replace(node, child)
+        self.set_right(child, node)
+        self.update_height(node)
+        self.update_height(child)
+        return child
+
+    # restores the heights and the balance of node and of all its ancestors
+    def rebalance(self, node):
+        while node:
+            node = self.update_height(node)
+            balance = height(node.left) - height(node.right)
+            if balance > 1:
+                if height(node.left.left) < height(node.left.right):
+                    self.rotate_left(node.left)
+                node = self.rotate_right(node)
+            elif balance < -1:
+                if height(node.right.right) < height(node.right.left):
+                    self.rotate_right(node.right)
+                node = self.rotate_left(node)
+            node = node.parent
+
+
+if __name__ == "__main__":
+    import time
+
+    # a window of events, as (time, name) pairs
+    events = SearchTree([(5, "lunch"), (1, "wake up"), (9, "dinner"), (3, "coffee"), (7, "meeting")])
+    events.remove((7, "meeting"))
+    print([node.value for node in events])
+    print([node.value for node in events.range((3,), (9,))])
+
+    # changing the tree stops the iterators over it, but not those over a snapshot
+    snapshot = events.snapshot()
+    iterator = iter(events)
+    next(iterator)
+    events.insert((2, "breakfast"))
+    try:
+        next(iterator)
+    except ConcurrentModificationError as e:
+        print(e)
+    print([node.value for node in snapshot], [node.value for node in events])
+
+    # a reader thread scans snapshots while the main thread keeps inserting
+    tree = SearchTree(range(0, 1000, 2))
+
+    def read():
+        for _ in range(100):
+            snapshot = tree.snapshot()
+            assert sum(1 for _ in snapshot) == len(snapshot)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    for value in range(1, 1000, 2):
+        tree.insert(value)
+    reader.join()
+    print(f"{len(tree)} values, scanned by the reader without locking")
+
+    size = 10 ** 5
+    tree = SearchTree(range(size))
+    print(f"{size} values in order, tree height {tree.root.height}")
+
+    start = time.perf_counter()
+    count = sum(1 for _ in tree.range(size // 2, size // 2 + 100))
+    print(f"{count} values out of {size} scanned in {time.perf_counter() - start:.6f} s")
@@ -11,18 +11,17 @@ class Node:
         if right:
             self.right.parent = self
 
+    # the nodes still to be visited are kept on a stack, right child below the left one, so that each node is yielded
+    # straight from here instead of being passed up through one nested generator per ancestor
     def traverse_preorder(self):
-        def traverse(current):
-            yield current
-            if current.left:
-                for left in traverse(current.left):
-                    yield left
-            if current.right:
-                for right in traverse(current.right):
-                    yield right
-
-        for node in traverse(self):
+        stack = [self]
+        while stack:
+            node = stack.pop()
             yield node
+            if node.right:
+                stack.append(node.right)
+            if node.left:
+                stack.append(node.left)
         # todo - return inorder values (not Nodes)
 
 
@@ -0,0 +1,212 @@
+# Tree files
+# A tree is written to disk as a header followed by one fixed-size record per node: the index of the left child, the
+# index of the right child (-1 for none), and the value. The reader maps the file into memory and iterates over it
+# directly: a node is only unpacked from its record when the traversal reaches it, and the pages of the file are only
+# read when they are touched, so opening a file of several GB takes no time and no Node object is ever created.
+import mmap
+import struct
+
+from iterator import PostOrderIterator
+
+MAGIC = b"TREE"
+VERSION = 1
+NO_NODE = -1
+
+# magic, version, format of the values, number of nodes, index of the root
+HEADER = struct.Struct("<4sH8sqq")
+
+
+def record_struct(value_format):
+    return struct.Struct("<qq" + value_format)
+
+
+# writes the tree under root, which can be a Node or anything with the same attributes; value_format is the struct
+# format of a value. Nodes are written in post-order, so the children of a node are always written before it, and only
+# the indices of the nodes still waiting for their parent are kept in memory
+def write_tree(root, path, value_format="q"):
+    record = record_struct(value_format)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, value_format.encode(), 0, NO_NODE))
+
+        count = 0
+        indices = {}
+        if root is not None:
+            for node in PostOrderIterator(root):
+                left = indices.pop(id(node.left)) if node.left else NO_NODE
+                right = indices.pop(id(node.right)) if node.right else NO_NODE
+                f.write(record.pack(left, right, node.value))
+                indices[id(node)] = count
+                count += 1
+
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, value_format.encode(), count, count - 1 if count else NO_NODE))
+    return count
+
+
+# what the reader yields: a view of the node at index, unpacked from the file on each access
+class FileNode:
+    __slots__ = ("file", "index")
+
+    def __init__(self, file, index):
+        self.file = file
+        self.index = index
+
+    @property
+    def value(self):
+        return self.file.record(self.index)[2]
+
+    @property
+    def left(self):
+        return self.file.node(self.file.record(self.index)[0])
+
+    @property
+    def right(self):
+        return self.file.node(self.file.record(self.index)[1])
+
+    def __eq__(self, other):
+        return isinstance(other, FileNode) and self.file is other.file and self.index == other.index
+
+    def __hash__(self):
+        return hash((id(self.file), self.index))
+
+    def __repr__(self):
+        return f"FileNode({self.value!r})"
+
+
+class TreeFile:
+    def __init__(self, path):
+        self.f = open(path, "rb")
+        try:
+            self.map = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.f.close()
+            raise ValueError(f"{path} is not a tree file")
+
+        if len(self.map) < HEADER.size:
+            self.close()
+            raise ValueError(f"{path} is not a tree file")
+        magic, version, value_format, self.size, self.root = HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a tree file")
+        self.record_struct = record_struct(value_format.rstrip(b"\0").decode())
+        if len(self.map) < HEADER.size + self.size * self.record_struct.size:
+            self.close()
+            raise ValueError(f"{path} is truncated")
+
+    def close(self):
+        self.map.close()
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return self.size
+
+    # left child, right child and value of the node at index
+    def record(self, index):
+        return self.record_struct.unpack_from(self.map, HEADER.size + index * self.record_struct.size)
+
+    def node(self, index):
+        return None if index == NO_NODE else FileNode(self, index)
+
+    def __iter__(self):
+        return FileInOrderIterator(self)
+
+
+# the reader has no parent links, so the iterators keep the path to the current node on a stack; each record is
+# unpacked once per traversal
+class FileInOrderIterator:
+    def __init__(self, file):
+        self.file = file
+        self.stack = []
+        self.descend(file.root)
+
+    # pushes index and its left descendants, with their right children
+    def descend(self, index):
+        while index != NO_NODE:
+            left, right, _ = self.file.record(index)
+            self.stack.append((index, right))
+            index = left
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.stack:
+            raise StopIteration
+        index, right = self.stack.pop()
+        self.descend(right)
+        return FileNode(self.file, index)
+
+
+class FilePreOrderIterator:
+    def __init__(self, file):
+        self.file = file
+        self.stack = [file.root] if file.root != NO_NODE else []
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.stack:
+            raise StopIteration
+        index = self.stack.pop()
+        left, right, _ = self.file.record(index)
+        if right != NO_NODE:
+            self.stack.append(right)
+        if left != NO_NODE:
+            self.stack.append(left)
+        return FileNode(self.file, index)
+
+
+def traverse_in_order(file):
+    return FileInOrderIterator(file)
+
+
+def traverse_preorder(file):
+    return FilePreOrderIterator(file)
+
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+    import time
+
+    from iterator import Node
+
+    #   1
+    #  / \
+    # 2   3
+    root = Node(1,
+                Node(2),
+                Node(3))
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "tree.bin")
+        write_tree(root, path)
+        with TreeFile(path) as tree:
+            print([x.value for x in traverse_in_order(tree)])
+            print([x.value for x in traverse_preorder(tree)])
+
+        size = 2 ** 20
+        level = [Node(i) for i in range(size)]
+        while len(level) > 1:
+            level = [Node(0, *level[i:i + 2]) for i in range(0, len(level), 2)]
+        start = time.perf_counter()
+        count = write_tree(level[0], path)
+        print(f"{count} nodes written in {time.perf_counter() - start:.3f} s, {os.path.getsize(path)} bytes")
+
+        start = time.perf_counter()
+        with TreeFile(path) as tree:
+            opened = time.perf_counter()
+            first = next(iter(tree)).value
+            print(f"opened in {opened - start:.6f} s, first value {first} read in {time.perf_counter() - opened:.6f} s")
+            start = time.perf_counter()
+            for _ in tree:
+                pass
+            print(f"traversed in {time.perf_counter() - start:.3f} s")
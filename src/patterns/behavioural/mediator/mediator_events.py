@@ -1,8 +1,5 @@
 # a mediator can be built also by means of events
-class Event(list):
-    def __call__(self, *args, **kwargs):
-        for item in self:
-            item(*args, **kwargs)
+from events import *
 
 
 # this is the mediator using events as communication means
@@ -31,7 +28,7 @@ class Player:
 
 class Coach:
     def __init__(self, game):
-        game.events.append(self.celebrate_goal)
+        self.subscription = game.events.subscribe(self.celebrate_goal)
 
     def celebrate_goal(self, args):
         if isinstance(args, GoalScoredInfo) and args.goals_scored < 3:
@@ -3,11 +3,7 @@
 # components of the system and notify other components accordingly.
 
 # Observer relies on the concept of Events, which are specific objects recording something that happened or happens.
-class Event(list):  # class Observer
-    # it is a list of callable functions that are called when the event is triggered
-    def __call__(self, *args, **kwargs):
-        for item in self:
-            item(*args, **kwargs)
+from events import *
 
 
 class Person:
@@ -31,8 +27,10 @@ if __name__ == "__main__":
 
     # to the fall hill event of the person, we add the call doctor function so that when a person falls ill, a doctor
     # is automatically called; the event is fired by the catch_a_cold method
-    p.falls_ill.append(lambda name, address: print(f"{name} at {address} got ill"))
-    p.falls_ill.append(call_doctor)
+    p.falls_ill.subscribe(lambda name, address: print(f"{name} at {address} got ill"))
+    doctor = p.falls_ill.subscribe(call_doctor)
     p.catch_a_cold()
-    p.falls_ill.remove(call_doctor)
+
+    # subscribing gives back a handle, which is what we use to stop being notified
+    doctor.unsubscribe()
     p.catch_a_cold()
@@ -1,8 +1,5 @@
 # what happens when we have a property depending on another property
-class Event(list):  # class Observer
-    def __call__(self, *args, **kwargs):
-        for item in self:
-            item(*args, **kwargs)
+from events import *
 
 
 class PropertyObservable:
@@ -43,7 +40,7 @@ if __name__ == "__main__":
 
 
     p = Person(13)
-    p.property_changed.append(person_changed)
+    p.property_changed.subscribe(person_changed)
     for age in range(16, 21):
         print(f"Changing age to {age}")
         p.age = age
@@ -1,7 +1,4 @@
-class Event(list):  # class Observer
-    def __call__(self, *args, **kwargs):
-        for item in self:
-            item(*args, **kwargs)
+from events import *
 
 
 class PropertyObservable:
@@ -28,14 +25,14 @@ class Person(PropertyObservable):
 class TrafficAuthority:
     def __init__(self, person):
         self.person = person
-        self.person.property_changed.append(
+        self.subscription = self.person.property_changed.subscribe(
             self.person_changed
         )
 
     def person_changed(self, name, value):
         if name == "age":
             if value >= 16:
-                self.person.property_changed.remove(self.person_changed)
+                self.subscription.unsubscribe()
                 print("You can now drive")
             else:
                 print("You are too young to drive")